@@ -0,0 +1,130 @@
+import asyncio
+import functools
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from clean_folder import clean
+from clean_folder.sniff import sniff_file_type
+QUEUE_SIZE = 256 #items waiting between two stages, a full queue stops the stage before it
+WALK_BATCH = 64 #DirEntry items taken from the walk by one executor call
+
+async def stream_clean(folder_to_clean, workers=4, extract_workers=0, queue_size=QUEUE_SIZE, **session_options):
+    """Async generator takes a path to folder to be cleaned, number of moving threads, number of extracting processes,
+    size of queues between stages and options of CleanSession (sniff, extraction_limits, index_path, journal_path...) as arguments
+    Cleans the folder in stages walk -> classify -> move/extract connected by bounded queues, never blocking the event loop
+    Yields event (dictionary) of every executed move, last event has type "finished" and holds CleanResult
+    Stops and cleans up when caller stops iterating"""
+    if session_options.get("duplicates_action") is not None:
+        raise ValueError("duplicates need all files planned before moving, they cant be handled by streaming pipeline")
+    loop = asyncio.get_running_loop()
+    planner = ThreadPoolExecutor(max_workers=1) #owns session bookkeeping, the index and the journal, which cant be shared between threads
+    try: #rules file is read by the session, so it is created by the planner too
+        session = await loop.run_in_executor(planner, functools.partial(clean.CleanSession, folder_to_clean, workers, extract_workers, **session_options))
+    except BaseException:
+        planner.shutdown(wait=False)
+        raise
+    walker = ThreadPoolExecutor(max_workers=1)
+    mover = ThreadPoolExecutor(max_workers=workers)
+    extractor = ProcessPoolExecutor(max_workers=extract_workers) if extract_workers > 0 else None
+    entries, moves, events = asyncio.Queue(queue_size), asyncio.Queue(queue_size), asyncio.Queue(queue_size)
+    movers = workers + extract_workers
+    tasks = [
+        asyncio.create_task(walk(session, loop, walker, entries)),
+        asyncio.create_task(classify(session, loop, planner, mover, entries, moves, movers)),
+    ]
+    tasks.extend(asyncio.create_task(move_files(session, loop, planner, mover, extractor, moves, events)) for _ in range(movers))
+    async def finish_stages():
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await events.put(None) #event stream ends also when a stage failed
+    finisher = asyncio.create_task(finish_stages())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        await finisher #raises error of a failed stage
+        await loop.run_in_executor(planner, session.move_engine.flush) #sources of copied files are removed once copies are synced
+        result = await loop.run_in_executor(planner, session.finish)
+        yield {"type": "finished", "result": result}
+    finally:
+        for task in tasks + [finisher]:
+            task.cancel()
+        await asyncio.gather(*tasks, finisher, return_exceptions=True)
+        await loop.run_in_executor(planner, session.close)
+        for executor in (walker, planner, mover, extractor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+async def clean_async(folder_to_clean, **options):
+    """Coroutine takes a path to folder to be cleaned and options of stream_clean as arguments
+    Cleans the folder and returns CleanResult"""
+    result = None
+    async for event in stream_clean(folder_to_clean, **options):
+        if event["type"] == "finished":
+            result = event["result"]
+    return result
+
+def take(iterator, count):
+    """Function returns list of up to count next items of an iterator"""
+    return [item for _, item in zip(range(count), iterator)]
+
+async def walk(session, loop, walker, entries):
+    """Walk stage, puts DirEntry of every file found into entries queue, then None"""
+    files = session.walk_files()
+    while True:
+        batch = await loop.run_in_executor(walker, take, files, WALK_BATCH)
+        if not batch:
+            break
+        for entry in batch:
+            await entries.put(entry)
+    await entries.put(None)
+
+async def classify(session, loop, planner, mover, entries, moves, movers):
+    """Classify stage, plans a move of every file from entries queue and puts it into moves queue
+    Puts None for every moving task at the end"""
+    file_index = await loop.run_in_executor(planner, session.open_index)
+    await loop.run_in_executor(planner, session.open_journal)
+    while True:
+        entry = await entries.get()
+        if entry is None:
+            break
+        if file_index is not None and await loop.run_in_executor(planner, session.is_processed, entry):
+            continue #file was already processed in previous run
+        item = Path(entry)
+        sniffed_extension = None
+        if session.sniff_workers > 0 and not session.rules.is_known(item.name): #fast path stays a dictionary lookup
+            sniffed_extension = await loop.run_in_executor(mover, sniff_file_type, item)
+        await moves.put(await loop.run_in_executor(planner, session.plan_file, item, sniffed_extension))
+    for _ in range(movers):
+        await moves.put(None)
+
+async def move_files(session, loop, planner, mover, extractor, moves, events):
+    """Move stage, executes moves from moves queue and puts an event of every moved file into events queue
+    Moves are dispatched by the planner, archives are unpacked on extracting processes if there are any"""
+    while True:
+        move = await moves.get()
+        if move is None:
+            break
+        future = await loop.run_in_executor(planner, session.dispatch_move, move, mover, extractor) #journal is written by the planner
+        if future is None: #folder was created and recorded at once
+            continue
+        result = await asyncio.wrap_future(future)
+        await loop.run_in_executor(planner, session.record_move, result)
+        await events.put(move_event(result))
+
+def move_event(result):
+    """Function takes an executed move, reason why it was skipped, its time, bytes moved and unpacked files as an argument
+    Returns event of the move"""
+    (action, item, destination, file_extension), skipped_reason, seconds, size, unpacked = result
+    return {
+        "type": "moved" if skipped_reason is None else "skipped",
+        "action": action,
+        "source": str(item),
+        "destination": str(destination),
+        "extension": file_extension,
+        "reason": skipped_reason,
+        "seconds": seconds,
+        "bytes": size,
+    }
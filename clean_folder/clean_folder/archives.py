@@ -0,0 +1,148 @@
+import os
+from pathlib import Path
+CHUNK_SIZE = 1024 * 1024 #archive members are copied in chunks of this size
+RATIO_CHECK_FROM = 16 * 1024 * 1024 #compression ratio is checked only when this many bytes were extracted
+DEFAULT_LIMITS = {"max_size": 4 * 1024 ** 3, "max_members": 100000, "max_ratio": 100}
+GZIP_MAGIC = b"\x1f\x8b"
+
+class ArchiveError(Exception):
+    """Raised when an archive cant be unpacked or breaks one of extraction limits"""
+
+class ExtractionBudget:
+    """Keeps track of members and bytes extracted from one archive
+    Raises ArchiveError as soon as one of the limits is broken"""
+
+    def __init__(self, archive, max_size, max_members, max_ratio):
+        self.archive_size = max(os.path.getsize(archive), 1)
+        self.max_size = max_size
+        self.max_members = max_members
+        self.max_ratio = max_ratio
+        self.members = 0
+        self.extracted = 0
+        self.files = {} #path of every unpacked file: its bytes
+
+    def add_member(self):
+        """Counts one more member of an archive"""
+        self.members += 1
+        if self.members > self.max_members:
+            raise ArchiveError(f"more than {self.max_members} members")
+
+    def add_bytes(self, size):
+        """Counts bytes written from an archive"""
+        self.extracted += size
+        if self.extracted > self.max_size:
+            raise ArchiveError(f"more than {self.max_size} bytes extracted")
+        if self.extracted > RATIO_CHECK_FROM and self.extracted / self.archive_size > self.max_ratio:
+            raise ArchiveError(f"compression ratio higher than {self.max_ratio}")
+
+def make_folder(folder):
+    """Default way of creating folders while unpacking, used when no folder cache is given"""
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def extract_archive(archive, destination, limits=None, ensure_folder=make_folder):
+    """Method takes path to an archive, destination folder, dictionary of limits and function creating folders as arguments
+    Unpacks zip, tar (also compressed) and gz archives member by member, copying in fixed-size chunks
+    Returns list of (folder, name, bytes) of every unpacked file, folders are joined with destination as it was given
+    Raises ArchiveError if archive is broken or breaks a limit, partially unpacked files are removed then
+    Archive modules are imported here, so runs without archives dont load them"""
+    import shutil
+    import tarfile
+    import zipfile
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    budget = ExtractionBudget(archive, limits["max_size"], limits["max_members"], limits["max_ratio"])
+    ensure_folder(destination)
+    try:
+        if zipfile.is_zipfile(archive):
+            extract_zip(archive, destination, budget, ensure_folder)
+        elif tarfile.is_tarfile(archive):
+            extract_tar(archive, destination, budget, ensure_folder)
+        elif is_gzip(archive):
+            extract_gzip(archive, destination, budget, ensure_folder)
+        else:
+            raise ArchiveError("unknown archive format")
+    except ArchiveError:
+        shutil.rmtree(destination, ignore_errors=True)
+        raise
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as error: #broken archive
+        shutil.rmtree(destination, ignore_errors=True)
+        raise ArchiveError(str(error)) from error
+    return unpacked_files(destination, budget.files)
+
+def unpacked_files(destination, files):
+    """Method takes destination folder and dictionary of unpacked file paths and bytes as arguments
+    Returns list of (folder, name, bytes), so the file list report doesnt need to walk unpacked folder"""
+    root = os.path.realpath(destination)
+    unpacked = []
+    for path, size in files.items():
+        folder = os.path.relpath(os.path.dirname(path), root)
+        unpacked.append((os.fspath(destination) if folder == "." else os.path.join(destination, folder), os.path.basename(path), size))
+    return unpacked
+
+def extract_zip(archive, destination, budget, ensure_folder):
+    """Method unpacks a zip archive member by member"""
+    import zipfile
+    with zipfile.ZipFile(archive) as zip_file:
+        for member in zip_file.infolist():
+            budget.add_member()
+            target = member_target(destination, member.filename)
+            if member.is_dir():
+                ensure_folder(target)
+                continue
+            with zip_file.open(member) as source:
+                copy_in_chunks(source, target, budget, ensure_folder)
+    return
+
+def extract_tar(archive, destination, budget, ensure_folder):
+    """Method unpacks a tar archive (also gzip, bz2 or xz compressed) as a stream, member by member
+    Only regular files and folders are unpacked, links and devices are skipped"""
+    import tarfile
+    with tarfile.open(archive, "r|*") as tar_file:
+        for member in tar_file:
+            budget.add_member()
+            target = member_target(destination, member.name)
+            if member.isdir():
+                ensure_folder(target)
+            elif member.isfile():
+                with tar_file.extractfile(member) as source:
+                    copy_in_chunks(source, target, budget, ensure_folder)
+    return
+
+def extract_gzip(archive, destination, budget, ensure_folder):
+    """Method unpacks a single gzip compressed file to destination folder"""
+    import gzip
+    budget.add_member()
+    target = member_target(destination, Path(archive).stem)
+    with gzip.open(archive, "rb") as source:
+        copy_in_chunks(source, target, budget, ensure_folder)
+    return
+
+def is_gzip(archive):
+    """Method checks if file starts with gzip signature"""
+    with open(archive, "rb") as file:
+        return file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+def member_target(destination, name):
+    """Method takes destination folder and name of an archive member as arguments
+    Returns path where member should be unpacked
+    Raises ArchiveError if member would end up outside destination folder"""
+    root = os.path.realpath(destination)
+    target = os.path.realpath(os.path.join(root, name))
+    if target != root and not target.startswith(root + os.sep):
+        raise ArchiveError(f"member {name} points outside of destination folder")
+    return target
+
+def copy_in_chunks(source, target, budget, ensure_folder):
+    """Method copies opened archive member to target file in fixed-size chunks"""
+    ensure_folder(os.path.dirname(target))
+    written = 0
+    with open(target, "wb") as file:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            budget.add_bytes(len(chunk))
+            file.write(chunk)
+            written += len(chunk)
+    budget.files[target] = written
+    return
@@ -0,0 +1,163 @@
+import os
+import sys
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from clean_folder import clean
+from clean_folder.report import write_report, moved_rows
+
+class RootRun:
+    """Planned moves of one root of a batch waiting to be scheduled on the shared pool"""
+
+    def __init__(self, session):
+        self.session = session
+        self.moves = iter(session.plan_folder()) #planned lazily, a root is scanned only as fast as its moves are executed
+        self.in_flight = 0
+        self.planned = False
+
+    def next_move(self):
+        """Returns next planned move of the root, None if there are no more moves"""
+        move = next(self.moves, None)
+        if move is None:
+            self.planned = True
+        return move
+
+def read_roots(roots_path):
+    """Function takes path to a file listing folders to clean, one per line, as an argument
+    Empty lines and lines starting with "#" are ignored
+    Returns list of folder paths"""
+    with open(roots_path, encoding="utf-8") as roots_file:
+        return [Path(line.strip()) for line in roots_file if line.strip() and not line.lstrip().startswith("#")]
+
+def clean_roots(roots, workers=4, extract_workers=0, **session_options):
+    """Function takes list of folders to clean, number of shared workers, number of shared extracting processes
+    and options of CleanSession (sniff, extraction_limits, metrics...) as arguments
+    Cleans all folders at once on one thread pool (and one process pool for archives), files are detected by content
+    on one more shared thread pool
+    Pools are bounded and shared fairly: every root with moves left may have the same number of moves waiting in the pools,
+    so one huge folder doesnt starve small ones
+    Returns list of CleanResult, in order of roots"""
+    if session_options.get("duplicates_action") is not None:
+        raise ValueError("duplicates need all files of a root hashed before moving, they cant be handled by batch runs")
+    sessions = [clean.CleanSession(root, workers, extract_workers, **session_options) for root in roots]
+    sniffer = ThreadPoolExecutor(max_workers=workers) if session_options.get("sniff") else None
+    for session in sessions:
+        session.sniffer = sniffer
+    try:
+        schedule(sessions, workers, extract_workers)
+        return [session.finish() for session in sessions]
+    finally:
+        if sniffer is not None:
+            sniffer.shutdown()
+        for session in sessions:
+            session.close()
+
+def schedule(sessions, workers, extract_workers):
+    """Function takes list of CleanSession, number of workers and number of extracting processes as arguments
+    Executes planned moves of all sessions, visiting roots round robin
+    Every root gets an equal share of pool slots, share grows as other roots finish"""
+    mover = ThreadPoolExecutor(max_workers=workers)
+    extractor = ProcessPoolExecutor(max_workers=extract_workers) if extract_workers > 0 else None
+    limit = (workers + extract_workers) * 4 #moves waiting in the pools at once
+    runs = deque(RootRun(session) for session in sessions)
+    pending = {} #future: RootRun
+    try:
+        while runs or pending:
+            share = max(1, limit // max(1, len(runs)))
+            for _ in range(len(runs)): #one turn of every root with moves left
+                if len(pending) >= limit:
+                    break
+                run = runs.popleft()
+                fill(run, share, pending, mover, extractor)
+                if not run.planned:
+                    runs.append(run)
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                run = pending.pop(future)
+                run.in_flight -= 1
+                run.session.record_move(future.result())
+    finally:
+        for executor in (mover, extractor):
+            if executor is not None:
+                executor.shutdown()
+        for session in sessions:
+            session.move_engine.flush() #sources of copied files are removed once copies are synced
+    return
+
+def fill(run, share, pending, mover, extractor):
+    """Function submits moves of one root until it has share moves in the pools
+    Moves are started by the session, batch runs have no duplicates, so no move has to wait for others"""
+    while run.in_flight < share:
+        move = run.next_move()
+        if move is None:
+            return
+        future = run.session.dispatch_move(move, mover, extractor)
+        if future is not None:
+            pending[future] = run
+            run.in_flight += 1
+    return
+
+def merge_results(results):
+    """Function takes list of CleanResult as an argument
+    Returns one CleanResult with extensions, skipped files, actions and transfers of all roots"""
+    actions, transfers, folder_cache = {}, {}, {}
+    for result in results:
+        for action, number in result.actions.items():
+            actions[action] = actions.get(action, 0) + number
+        for strategy, stats in result.transfers.items():
+            totals = transfers.setdefault(strategy, {"files": 0, "bytes": 0})
+            totals["files"] += stats["files"]
+            totals["bytes"] += stats["bytes"]
+        for key, number in result.folder_cache.items():
+            folder_cache[key] = folder_cache.get(key, 0) + number
+    return clean.CleanResult(
+        os.pathsep.join(str(result.folder) for result in results),
+        sorted({extension for result in results for extension in result.known_extensions}),
+        sorted({extension for result in results for extension in result.unknown_extensions}),
+        {skipped_file: reason for result in results for skipped_file, reason in result.skipped_files.items()},
+        actions,
+        transfers,
+        folder_cache,
+        results[0].metrics if results else None, #metrics are shared by all roots of a batch
+        [file for result in results for file in result.files],
+    )
+
+def roots_report(results):
+    """Function takes list of CleanResult as an argument and prints number of moved and skipped files of every root"""
+    print('|{:^80}|'.format("-"*80))
+    print('|{:^80}|'.format("*****Cleaned Folders*****"))
+    print('|{:^80}|'.format("-"*80))
+    for result in results:
+        print('|{:^80}|'.format(f"{result.folder}: {sum(result.actions.values())} moved, {len(result.skipped_files)} skipped"))
+    print('|{:^80}|'.format("-"*80))
+    return
+
+def run_batch(roots, workers=1, extract_workers=0, metrics_path=None, metrics_format="json", report_format="text", report_path=None, quiet=False, **session_options):
+    """Function takes list of folders to clean, number of workers and extracting processes, metrics file and its format,
+    file list report format and its file, quiet flag and options of CleanSession as arguments
+    Cleans the folders, prints one report for all of them (only errors and skipped files if quiet) and returns exit code"""
+    if not roots:
+        print("No folders to clean", file=sys.stderr)
+        return clean.EXIT_FAILURE
+    not_folders = [str(root) for root in roots if not Path(root).is_dir()]
+    if not_folders:
+        print(f"Arguments are not correct directories: {', '.join(not_folders)}", file=sys.stderr)
+        return clean.EXIT_FAILURE
+    if not quiet:
+        print(f"Folders to clean: {len(roots)}")
+    metrics = clean.Metrics() if metrics_path is not None else None
+    results = clean_roots(roots, workers, extract_workers, metrics=metrics, **session_options)
+    result = merge_results(results)
+    if not quiet:
+        clean.extensions_found_report(result)
+        clean.moves_report(result)
+        roots_report(results)
+    else:
+        clean.skipped_files_report(result)
+    if not quiet or report_path is not None:
+        write_report(moved_rows(result.files), report_format, report_path)
+    if metrics is not None:
+        metrics.write(metrics_path, metrics_format)
+    return clean.EXIT_OK
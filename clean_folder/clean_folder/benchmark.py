@@ -0,0 +1,210 @@
+import os
+import re
+import io
+import sys
+import json
+import time
+import random
+import timeit
+import statistics
+import subprocess
+import tarfile
+import zipfile
+import tempfile
+import contextlib
+from pathlib import Path
+from clean_folder import clean
+NAME_WORDS = ("zdjęcie", "wakacje", "Łódź", "raport", "żółw", "dokument", "piosenka", "film", "ćma", "notatki", "Źródło", "dane", "ŻÓŁĆ", "spotkanie")
+UNKNOWN_SAMPLE = ("xyz", "dat", "bak", "tmp", "")
+SAMPLE_NAMES = ("zdjęcie z wakacji (1).JPG", "Łódź - raport końcowy.docx", "piosenka.mp3", "film_2023.mkv", "archiwum ważne.zip", "notatki", "dane.xyz", "Źródło ŻÓŁĆ.pdf")
+
+def legacy_normalize(string_to_normalize):
+    """Copy of normalize() from before the translation table, kept as a reference for the benchmark"""
+    modified_full_name = ""
+    file_name, file_extension = os.path.splitext(string_to_normalize)
+    file_extension = file_extension.lstrip(".")
+    for character in file_name:
+        if character in clean.POLISH_CHARACTERS:
+            character = clean.POLISH_CHARACTERS[character]
+        if not re.search(r"\w", character):
+            character = "_"
+        modified_full_name += character
+    modified_full_name += "." + file_extension
+    return modified_full_name, file_name, file_extension
+
+def legacy_classify(name):
+    """Classification as it was done before: name normalized up to three times and designated folders scanned linearly"""
+    if legacy_normalize(name)[2].lower() not in clean.KNOWN_EXTENSIONS: #extension checked first
+        return "Unknown", legacy_normalize(name)
+    legacy_normalize(name)[2].lower() in clean.ARCHIVE_EXTENSIONS #main loop checking for archives
+    new_full_name, new_file_name, file_extension = legacy_normalize(name) #move_known_file
+    for data_type, extension_list in clean.DESIGNATED_FOLDERS.items():
+        if file_extension.lower() in extension_list:
+            return data_type, new_full_name
+
+def time_per_file(function, names, repeat=5, number=2000):
+    """Method returns best time in microseconds of calling function once for every name"""
+    timer = timeit.Timer(lambda: [function(name) for name in names])
+    return min(timer.repeat(repeat=repeat, number=number)) / (number * len(names)) * 1000000
+
+def normalize_benchmark(names=SAMPLE_NAMES):
+    """Microbenchmark of per-file classification, before and after precompiled translation table
+    Returns dictionary with time per file in microseconds and speedup"""
+    legacy = time_per_file(legacy_classify, names)
+    current = time_per_file(clean.classify, names)
+    return {"legacy_us_per_file": round(legacy, 3), "current_us_per_file": round(current, 3), "speedup": round(legacy / current, 2)}
+
+STARTUP_HEAVY_MODULES = ("concurrent.futures", "sqlite3", "hashlib", "tarfile", "zipfile", "gzip", "shutil", "csv") #loaded only by runs that need them
+
+def package_environment():
+    """Function returns environment in which new interpreter imports this copy of clean_folder"""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(clean.__file__)))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (package_parent, os.environ.get("PYTHONPATH")))))
+
+def import_times(module):
+    """Function imports module in a new interpreter started with -X importtime
+    Returns dictionary of every imported module: (self, cumulative) time in microseconds"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, env=package_environment(), check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if self_time.strip().isdigit(): #skips header line
+            times[name.strip()] = (int(self_time), int(cumulative))
+    return times
+
+def command_time(command, folder=None):
+    """Function runs command in a new process, with tiny folder to clean created before if given
+    Returns wall time in milliseconds"""
+    if folder is not None:
+        folder.mkdir(exist_ok=True)
+        for name in ("photo.jpg", "notes.txt", "data.xyz"):
+            (folder / name).write_bytes(b"x")
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=package_environment(), check=True)
+    return (time.perf_counter() - start) * 1000
+
+def startup_benchmark(runs=10):
+    """Benchmark of startup of the console script, measured on a tiny folder
+    Import time of clean_folder.clean comes from -X importtime, interpreter alone and whole CLI run are timed too
+    If CLEAN_FOLDER_SOCKET is set, run through resident server is timed as well
+    Returns dictionary with median times in milliseconds, slowest imports and heavy modules that were loaded"""
+    times = import_times("clean_folder.clean") #first run may write bytecode
+    imports = []
+    for _ in range(runs):
+        times = import_times("clean_folder.clean")
+        imports.append(times["clean_folder.clean"][1] / 1000)
+    results = {"runs": runs, "import_ms": round(statistics.median(imports), 2)}
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        folder = Path(temporary_folder) / "root"
+        results["interpreter_ms"] = round(statistics.median(command_time([sys.executable, "-c", "pass"]) for _ in range(runs)), 2)
+        results["cli_ms"] = round(statistics.median(command_time([sys.executable, "-m", "clean_folder.clean", str(folder)], folder) for _ in range(runs)), 2)
+        if os.environ.get("CLEAN_FOLDER_SOCKET"):
+            client = [sys.executable, "-c", "from clean_folder.server import client_main; client_main()", str(folder)]
+            results["client_ms"] = round(statistics.median(command_time(client, folder) for _ in range(runs)), 2)
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    results["slowest_imports_us"] = {name: self_time for name, (self_time, cumulative) in slowest}
+    results["heavy_modules_loaded"] = [name for name in STARTUP_HEAVY_MODULES if name in times]
+    return results
+
+def generate_tree(root, files=1000, depth=3, fanout=3, seed=0, archives=2, unknown=10, file_size=256):
+    """Function creates reproducible synthetic folder to clean and returns its path
+    -depth and fanout give number of nested subfolders
+    -archives and unknown are percents of files being archives (zip or tar.gz) and files with unknown extension
+    -other files get extensions from KNOWN_EXTENSIONS and names with polish characters, spaces and punctuation
+    Same seed always gives the same tree"""
+    rng = random.Random(seed)
+    root = Path(root)
+    folders = [root]
+    level = [root]
+    for _ in range(depth): #creating nested subfolders
+        level = [folder / f"{rng.choice(NAME_WORDS)} {index}" for folder in level for index in range(fanout)]
+        folders.extend(level)
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    plain_extensions = [extension for extension in clean.KNOWN_EXTENSIONS if extension not in clean.ARCHIVE_EXTENSIONS]
+    for index in range(files):
+        folder = rng.choice(folders)
+        name = f"{rng.choice(NAME_WORDS)}{rng.choice(' _-(!')}{rng.randrange(files)}"
+        roll = rng.randrange(100)
+        if roll < archives:
+            write_archive(folder / name, rng, file_size, index % 2 == 0)
+            continue
+        extension = rng.choice(UNKNOWN_SAMPLE) if roll < archives + unknown else rng.choice(plain_extensions)
+        with open(folder / (f"{name}.{extension}" if extension else name), "wb") as file:
+            file.write(rng.randbytes(file_size))
+    return root
+
+def write_archive(path, rng, file_size, as_zip):
+    """Function writes small zip or tar.gz archive with three members"""
+    members = {f"{rng.choice(NAME_WORDS)}_{index}.txt": rng.randbytes(file_size) for index in range(3)}
+    if as_zip:
+        with zipfile.ZipFile(f"{path}.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        return
+    with tarfile.open(f"{path}.tar.gz", "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return
+
+def timed(stages, stage, function, *arguments):
+    """Function runs function with arguments, saves its time in stages and returns its result"""
+    start = time.perf_counter()
+    result = function(*arguments)
+    stages[stage] = round(time.perf_counter() - start, 6)
+    return result
+
+def tree_benchmark(files=1000, depth=3, fanout=3, seed=0, archives=2, unknown=10, file_size=256, workers=1, extract_workers=0):
+    """Benchmark of whole cleaning of a synthetic tree
+    Times walk, normalize, move, extract, delete_empty_folders and reporting separately
+    Returns dictionary with parameters, time of every stage in seconds and files per second"""
+    stages = {}
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        root = timed(stages, "generate", generate_tree, Path(temporary_folder) / "root", files, depth, fanout, seed, archives, unknown, file_size)
+        session = clean.CleanSession(root, workers, extract_workers)
+        entries = timed(stages, "walk", lambda: [entry for entry in clean.scan_folder(root) if not entry.is_dir(follow_symlinks=False)])
+        timed(stages, "normalize", lambda: [clean.classify(entry.name) for entry in entries])
+        moves = timed(stages, "plan", lambda: list(session.plan_moves()))
+        timed(stages, "move", session.run_moves, [move for move in moves if move[0] != "archive"])
+        timed(stages, "extract", session.run_moves, [move for move in moves if move[0] == "archive"])
+        timed(stages, "delete_empty_folders", session.delete_empty_folders)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            timed(stages, "report", lambda: (clean.extensions_found_report(session.result()), clean.write_report(clean.moved_rows(session.files))))
+    total = sum(seconds for stage, seconds in stages.items() if stage != "generate")
+    parameters = {"files": files, "depth": depth, "fanout": fanout, "seed": seed, "archives": archives, "unknown": unknown, "file_size": file_size, "workers": workers, "extract_workers": extract_workers}
+    return {"parameters": parameters, "stages": stages, "total": round(total, 6), "files_per_second": round(len(entries) / total, 1) if total else None}
+
+BENCHMARKS = {"normalize": normalize_benchmark, "tree": tree_benchmark, "startup": startup_benchmark}
+
+TREE_OPTIONS = (("files", 1000, 1), ("depth", 3, 0), ("fanout", 3, 1), ("seed", 0, 0), ("archives", 2, 0), ("unknown", 10, 0), ("file_size", 256, 0), ("workers", 1, 1), ("extract_workers", 0, 0)) #name, default, minimum
+
+def main(argv=None):
+    """Runs benchmarks given as arguments (all by default) and prints results as JSON
+    Returns exit code
+    Layout on disk, duplicates, resume and plans are checked by tests in tests folder"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="clean_folder.benchmark", description="Benchmarks of clean_folder, results are printed as JSON")
+    parser.add_argument("names", nargs="*", metavar="BENCHMARK", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    for name, default, minimum in TREE_OPTIONS:
+        parser.add_argument("--" + name.replace("_", "-"), type=clean.number_argument(minimum), default=default, help=f"tree benchmark option (default: {default})")
+    parser.add_argument("--output", metavar="FILE", help="also save results to FILE")
+    options = parser.parse_args(argv)
+    unknown_names = [name for name in options.names if name not in BENCHMARKS]
+    if unknown_names:
+        parser.error(f"unknown benchmarks: {', '.join(unknown_names)}")
+    tree_options = {name: getattr(options, name) for name, default, minimum in TREE_OPTIONS}
+    results = {"python": sys.version.split()[0], "platform": sys.platform}
+    for name in options.names or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name](**tree_options) if name == "tree" else BENCHMARKS[name]()
+    print(json.dumps(results, indent=2))
+    if options.output is not None:
+        with open(options.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    return clean.EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,18 @@ import sys
 import re
 import os
 from pathlib import Path
-import shutil
+import json
+import time
+import threading
+import contextlib
+from clean_folder.sniff import sniff_file_type
+from clean_folder.transfer import MoveEngine, MoveSkipped, replace_with_link
+from clean_folder.names import NameRegistry, DestinationFolders
+from clean_folder.metrics import Metrics, METRICS_FORMATS
+from clean_folder.journal import Journal, check_journal, journal_root, read_journal, recover_move, encode_move, decode_move
+from clean_folder.rules import Rules, load_rules, reload_rules
+from clean_folder.report import write_report, moved_rows, index_rows, REPORT_FORMATS
+from clean_folder.archives import extract_archive, ArchiveError, DEFAULT_LIMITS #archive modules are imported by extraction itself
 IMAGE_EXTENSIONS = ("jpeg", "png", "jpg", "svg")
 VIDEO_EXTENSIONS = ("avi", "mp4", "mov", "mkv")
 DOC_EXTENSIONS = ("doc", "docx", "txt", "pdf", "xlsx", "pptx")
@@ -12,198 +23,916 @@ UNKNOWN_EXTENSIONS = ()
 KNOWN_EXTENSIONS = (IMAGE_EXTENSIONS + VIDEO_EXTENSIONS + DOC_EXTENSIONS + AUDIO_EXTENSIONS + ARCHIVE_EXTENSIONS + UNKNOWN_EXTENSIONS)
 DESIGNATED_FOLDERS = {"Images": IMAGE_EXTENSIONS, "Video": VIDEO_EXTENSIONS, "Documents": DOC_EXTENSIONS, "Audio": AUDIO_EXTENSIONS, "Archives": ARCHIVE_EXTENSIONS, "Unknown": UNKNOWN_EXTENSIONS}
 POLISH_CHARACTERS = {"Ą": "A", "Ć": "C", "Ę": "E", "Ł": "L", "Ń": "N", "Ó": "O", "Ś": "S", "Ź": "Z", "Ż": "Z", "ą": "a", "ć": "c", "ę": "e", "ł": "l", "ń": "n", "ó": "o", "ś": "s", "ź": "z", "ż": "z"}
-known_extensions_found = set()
-unknown_extensions_found = set()
-folder_to_clean = None
-
-def check_argument():
-    """Takes no arguments.
-    Checks if script was run with correct argument (path to folder to clean)
-    If not, asks user if wants to run a script in current directory
-    """
-    if len(sys.argv) < 2: #if script was run without an argument, suggest running script for current directory
-        print("You didnt run script with argument (path to folder to clean)")
-        while True:         
-            decision = input(f"Do you want to run script for the current directory? Current directory: {os.getcwd()} y/n: ")
-            if decision.lower() == "y":
-                return Path(os.getcwd())
-            elif decision.lower() == "n":
-                print("Whatever. Have a nice day. Bye")
-                exit()
-            else:
-                print("You need to type y/n. Try again.")
-                continue
-    elif not Path(sys.argv[1]).is_dir(): #checks if argument is a valid directory
-        print("Argument is not a correct directiory")
-        exit()
-    else: # script was run with correct argument (path to folder to clean)
-        print(f'Folder to clean: {sys.argv[1]}')
-        return Path(sys.argv[1])
-
-def normalize(string_to_normalize):
-    """This method takes string as an input and returns altered string.
+TRANSLATION_TABLE = str.maketrans(POLISH_CHARACTERS) #changes polish characters to latin
+NOT_WORD_CHARACTER = re.compile(r"\W") #charactes other then letters, digits and "_"
+ACTIONS = {"Archives": "archive", "Unknown": "unknown"} #any other designated folder gets "known" action
+DEFAULT_RULES = Rules({data_type: {"extensions": extension_list} for data_type, extension_list in DESIGNATED_FOLDERS.items()}, ACTIONS) #rules file adds to these
+SNIFF_BATCH = 256 #files with unknown extension are detected in batches of this size
+DUPLICATES_ACTIONS = ("skip", "hardlink", "move")
+STAGES = {"archive": "extract", "folder": "mkdir"} #stage of every action in metrics, other actions are "move"
+EXIT_OK, EXIT_FAILURE = 0, 1 #exit codes of console script, wrong options exit with 2 from argparse
+MOVE_ACTIONS = {"link": "link_duplicate", "folder": "create_folder", "known": "move_known_file", "unknown": "move_unknown_file", "archive": "move_archive_file"} #CleanSession method executing every action
+
+def number_argument(minimum):
+    """Function takes minimal allowed value as an argument
+    Returns argparse type accepting whole numbers not smaller than minimum"""
+    import argparse
+    def number(value):
+        if not value.isdigit() or int(value) < minimum: #checks if value is a number big enough
+            raise argparse.ArgumentTypeError(f"needs to be a number not smaller than {minimum}")
+        return int(value)
+    return number
+
+def normalize(string_to_normalize, file_extension=None):
+    """This method takes string and optional extension (e.g. compound "tar.gz") as an input and returns altered string.
     Replaces characters "ę" "ą" "ż" etc for "e" "a "z"
-    Charactes other then letters and digits are replaced with "_" 
+    Charactes other then letters and digits are replaced with "_"
     returns full name, separeted file name and separeted extension"""
-    modified_full_name = ""
-    file_name, file_extension = os.path.splitext(string_to_normalize) # separates file name and file extension
-    file_extension = file_extension.lstrip(".")
-    for character in file_name: # only file name is modified
-        if character in POLISH_CHARACTERS: #changes polish characters to latin
-            character = POLISH_CHARACTERS[character]
-        if not re.search("\w", character): #charactes other then letters, digits and "_" gets replaced with "_"
-            character = "_"
-        modified_full_name += character
-    modified_full_name += "." + file_extension
+    if file_extension is None:
+        file_name, file_extension = os.path.splitext(string_to_normalize) # separates file name and file extension
+        file_extension = file_extension.lstrip(".")
+    else:
+        file_name = string_to_normalize[:len(string_to_normalize) - len(file_extension) - 1]
+    modified_full_name = NOT_WORD_CHARACTER.sub("_", file_name.translate(TRANSLATION_TABLE)) + "." + file_extension # only file name is modified
     return modified_full_name, file_name, file_extension
 
-def going_through_folders_and_sorting_files_out(main_path_to_clean, current_path=None):
-    """Funcion takes a path to folder to be cleaned as an argument and path to current subfolder(recurence)
-    -funcion unpackes archives
-    -normalize file names and moves them to designanted folders
-    -doesnt change a name of a file with unknown extension"""
-    if current_path == None:
-        current_path = main_path_to_clean
-    for item in current_path.iterdir():
-        if item.is_dir(): #checks if item is a folder
-            if item.name in DESIGNATED_FOLDERS.keys(): #ignoring certain folders
-                continue
+def classify(name, rules=DEFAULT_RULES):
+    """Method takes a string (file name) and compiled Rules as arguments
+    Returns designated folder of a file ("Unknown" if no rule matches), normalized full name, file name and extension
+    File name is normalized only once, result is passed down to planning of a move"""
+    data_type, suffix = rules.classify(name)
+    return (data_type,) + normalize(name, suffix)
+
+def list_folder(path, metrics=None, children=None):
+    """Method takes a path to folder, optional Metrics and optional dictionary for numbers of items as arguments
+    Returns an iterator over DirEntry items of the folder
+    Folder is listed at once, so files can be moved out of it while iterating"""
+    start = time.perf_counter()
+    with os.scandir(path) as entries:
+        entries = list(entries)
+    if children is not None: #number of items is saved, so the folder doesnt need listing to know if it is empty
+        children[os.fspath(path)] = len(entries)
+    if metrics is not None:
+        metrics.observe("scan", time.perf_counter() - start, files=len(entries))
+        metrics.count("scandir")
+    return iter(entries)
+
+def scan_folder(path, metrics=None, children=None, ignored=DESIGNATED_FOLDERS):
+    """Generator takes a path to folder, optional Metrics, optional dictionary for numbers of items and names of designated folders as arguments
+    Goes through folder and all its subfolders without recurence, using cached DirEntry type info
+    Yields DirEntry of every file, and DirEntry of every subfolder after all its content was yielded
+    If children is given, number of items of every listed folder is saved in it
+    Ignores designated folders"""
+    stack = [(None, list_folder(path, metrics, children))] # stack of (folder, not yet visited items of the folder)
+    while stack:
+        folder, entries = stack[-1]
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False): #checks if item is a folder
+                if entry.name in ignored: #ignoring certain folders
+                    continue
+                stack.append((entry, list_folder(entry.path, metrics, children))) # going into subfolder
+                break
+            yield entry # item is a file
+        else: # all items of the folder were visited
+            stack.pop()
+            if folder is not None:
+                yield folder
+    return
+
+class CleanResult:
+    """Outcome of one cleaning run: extensions found, skipped files, number of moves of every action,
+    files and bytes moved by renaming and copying, folder cache stats, metrics summary (None if not collected)
+    and (folder, name, bytes) of every moved file used by file list report, also of every file unpacked from archives"""
+
+    def __init__(self, folder, known_extensions, unknown_extensions, skipped_files, actions, transfers, folder_cache, metrics=None, files=None):
+        self.folder = folder
+        self.known_extensions = known_extensions
+        self.unknown_extensions = unknown_extensions
+        self.skipped_files = skipped_files
+        self.actions = actions
+        self.transfers = transfers
+        self.folder_cache = folder_cache
+        self.metrics = metrics
+        self.files = files if files is not None else []
+
+    def to_dict(self):
+        """Returns result as a dictionary ready to be saved as JSON, without list of moved files"""
+        return {
+            "folder": str(self.folder),
+            "known_extensions": self.known_extensions,
+            "unknown_extensions": self.unknown_extensions,
+            "skipped_files": self.skipped_files,
+            "actions": self.actions,
+            "transfers": self.transfers,
+            "folder_cache": self.folder_cache,
+            "metrics": self.metrics,
+        }
+
+class CleanSession:
+    """One cleaning of a folder with its own configuration, folder cache, move engine, index and stats
+    Sessions share no state, so many of them can run in parallel threads of one process
+    -workers is number of threads moving files, extract_workers is number of processes unpacking archives
+    -extraction_limits overrides DEFAULT_LIMITS
+    -sniff detects type of files with unknown extension by content
+    -duplicates_action is "skip", "hardlink" or "move" to handle files with the same content, None turns detection off
+    -index_path is sqlite index of already processed files used by incremental runs
+    -collect_metrics turns on Metrics of the session, metrics can be given instead to share one Metrics between sessions
+    -journal_path is journal of started and finished moves, which lets an interrupted run be resumed
+    -rules_path is rules file with categories added to built-in ones, it is loaded again by reload_rules when it changes"""
+
+    def __init__(self, folder_to_clean, workers=1, extract_workers=0, extraction_limits=None, sniff=False, duplicates_action=None, index_path=None, collect_metrics=False, metrics=None, journal_path=None, rules_path=None):
+        if duplicates_action is not None and duplicates_action not in DUPLICATES_ACTIONS:
+            raise ValueError(f"duplicates_action needs to be one of: {', '.join(DUPLICATES_ACTIONS)}")
+        self.folder_to_clean = Path(folder_to_clean)
+        self.rules = load_rules(rules_path, DEFAULT_RULES) if rules_path is not None else DEFAULT_RULES
+        self.destinations = DestinationFolders(self.folder_to_clean, self.rules.folders) #paths of designated folders
+        self.workers = workers
+        self.extract_workers = extract_workers
+        self.extraction_limits = dict(DEFAULT_LIMITS, **(extraction_limits or {}))
+        self.sniff_workers = workers if sniff else 0 #number of threads detecting type of files by content, 0 turns detection off
+        self.sniffer = None #thread pool detecting files by content shared by many sessions, plan_moves starts its own if not set
+        self.duplicates_action = duplicates_action
+        self.index_path = index_path
+        self.file_index = None #FileIndex, opened by the first run, so it belongs to thread running the session
+        self.journal_path = journal_path
+        self.journal = None #Journal, opened by the first run
+        self.journal_ids = {} #move: its id in the journal
+        self.own_files = set() #absolute paths of files written by the run itself (e.g. the journal) or skipped before resume, never planned
+        if journal_path is not None:
+            self.exclude_file(journal_path)
+        self.known_extensions_found = set()
+        self.unknown_extensions_found = set()
+        self.skipped_files = {} #file path: reason why it wasnt moved or unpacked
+        self.actions = {} #action: number of executed moves
+        self.files = [] #(folder, name, bytes) of every moved file, kept for file list report
+        self.folder_children = {} #folder path: number of items left in it, recorded by the walk
+        self.walked_folders = [] #folders found by the walk, subfolders before their parent
+        self.created_folders = set() #absolute paths of folders already checked or created during this session
+        self.folder_cache_stats = {"hits": 0, "misses": 0}
+        self.folder_cache_lock = threading.Lock()
+        self.metrics = metrics if metrics is not None or not collect_metrics else Metrics()
+        self.move_engine = MoveEngine(self.metrics) #renames files on the same device, copies them otherwise
+        self.names = NameRegistry(self.metrics) #names taken in destination folders, shared by all moves planned by the session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def run(self):
+        """Method plans and executes moves of all files in folder to be cleaned, then deletes empty folders
+        -unpackes archives
+        -normalize file names and moves them to designanted folders
+        -doesnt change a name of a file with unknown extension
+        Returns CleanResult"""
+        self.open_journal()
+        with self.stage_timer("clean"):
+            self.run_moves(self.plan_folder())
+        return self.finish()
+
+    def apply_plan(self, moves):
+        """Method takes iterable of moves planned earlier (e.g. read with read_plan) as an argument
+        Executes the moves, except moves of files written by the run itself, deletes empty folders and returns CleanResult"""
+        self.open_index()
+        self.open_journal()
+        with self.stage_timer("clean"):
+            self.run_moves(move for move in moves if move[1] is None or not self.is_own_file(move[1]))
+        return self.finish()
+
+    def resume(self):
+        """Method continues a run stopped before it finished, using the journal instead of planning everything again
+        Moves which were not finished are checked and executed again, skipped files stay skipped
+        Files which werent planned before the run was stopped are planned as usual afterwards
+        Returns CleanResult"""
+        records, next_id = read_journal(self.journal_path)
+        self.journal = Journal(self.journal_path, self.folder_to_clean, next_id)
+        def moves():
+            for move_id, move, finished, skipped_reason in records:
+                if skipped_reason is not None:
+                    self.skipped_files[str(move[1])] = skipped_reason
+                    self.exclude_file(move[1]) #not planned again by the walk below, e.g. an archive over extraction limits
+                    continue
+                move = recover_move(move, finished)
+                if move is not None:
+                    self.journal_ids[move] = move_id #move is not saved in the journal again
+                    yield move
+        self.open_index()
+        with self.stage_timer("clean"):
+            self.run_moves(moves())
+            self.run_moves(self.plan_folder()) #only files left in the folder are walked
+        return self.finish()
+
+    def finish(self):
+        """Method deletes empty folders left after moves and returns CleanResult"""
+        with self.stage_timer("delete_empty_folders"):
+            self.delete_empty_folders()
+        return self.result()
+
+    def result(self):
+        """Method returns CleanResult with everything collected by the session so far"""
+        return CleanResult(
+            self.folder_to_clean,
+            sorted(self.known_extensions_found),
+            sorted(self.unknown_extensions_found),
+            dict(self.skipped_files),
+            dict(self.actions),
+            {strategy: dict(stats) for strategy, stats in self.move_engine.stats.items()},
+            dict(self.folder_cache_stats),
+            None if self.metrics is None else self.metrics.summary(),
+            self.files,
+        )
+
+    def close(self):
+        """Method closes the index, session cant be used afterwards"""
+        if self.file_index is not None:
+            self.file_index.close()
+            self.file_index = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        return
+
+    def stage_timer(self, stage):
+        """Method takes name of a stage as an argument
+        Returns context manager measuring time of the stage, doing nothing if metrics are not collected"""
+        return self.metrics.timer(stage) if self.metrics is not None else contextlib.nullcontext()
+
+    def designated_folders(self):
+        """Method returns names of designated folders, which are not cleaned again
+        'Duplicates' is one of them only when duplicates are moved there, otherwise user's folder with that name is cleaned as usual"""
+        if self.duplicates_action == "move":
+            return self.rules.folders + ("Duplicates",)
+        return self.rules.folders
+
+    def open_index(self):
+        """Method opens index of already processed files used by incremental runs, if session has index_path
+        New index gets all files already present in designated folders"""
+        if self.index_path is None or self.file_index is not None:
+            return self.file_index
+        from clean_folder.index import FileIndex #sqlite3 is loaded only by incremental runs
+        self.file_index = FileIndex(self.index_path, self.folder_to_clean)
+        if self.file_index.is_new:
+            for data_type in self.rules.folders:
+                if self.destinations.folder(data_type).is_dir():
+                    self.file_index.add_folder(self.destinations.folder(data_type))
+        return self.file_index
+
+    def open_journal(self):
+        """Method opens journal of moves, if session has journal_path"""
+        if self.journal_path is not None and self.journal is None:
+            self.journal = Journal(self.journal_path, self.folder_to_clean)
+        return self.journal
+
+    def reload_rules(self):
+        """Method loads rules file again if it changed, new rules are used by moves planned afterwards
+        Broken rules file is reported on stderr and previous rules are kept
+        Returns True if rules were changed"""
+        try:
+            rules = reload_rules(self.rules, DEFAULT_RULES)
+        except (OSError, ValueError, re.error) as error: #also broken JSON or TOML
+            print(f"Rules file {self.rules.path} was not loaded: {error}", file=sys.stderr)
+            return False
+        changed, self.rules = rules is not self.rules, rules
+        return changed
+
+    def journal_move(self, move):
+        """Method takes a move which is about to be executed as an argument and saves it in the journal"""
+        if self.journal is not None and move not in self.journal_ids:
+            self.journal_ids[move] = self.journal.started(move)
+        return
+
+    def submit_archive(self, extractor, move):
+        """Method takes process pool and a move of an archive as arguments
+        Submits unpacking of the archive to the pool and returns future of its execute_move result
+        When moves are journaled, archive is removed by move engine after unpacked files were synced"""
+        return extractor.submit(execute_move, unpack_archive, move, self.extraction_limits, self.journal is None)
+
+    def plan_folder(self):
+        """Method returns planned moves of all files found, with duplicates handled if duplicates_action is set"""
+        self.open_index()
+        if self.duplicates_action is None:
+            return self.plan_moves()
+        return self.plan_duplicates(list(self.plan_moves()))
+
+    def plan_duplicates(self, moves):
+        """Method takes list of planned moves as an argument
+        Finds files with the same content and changes their moves according to duplicates_action:
+        -skip leaves duplicate where it is
+        -hardlink moves duplicate as usual, then replaces it with hard link to the first file if both still have the same content,
+         links are made after all other moves
+        -move moves duplicate to 'Duplicates' folder without changing a name
+        Returns list of moves"""
+        from clean_folder.dedup import find_duplicates #hashing and its process pool are loaded only with --dedup
+        files = [move[1] for move in moves if move[0] in ("known", "unknown")] #archives are unpacked, not compared
+        duplicates = find_duplicates(files)
+        if not duplicates:
+            return moves
+        destinations = {move[1]: move[2] for move in moves if move[1] in duplicates.values()}
+        planned_moves, later_moves = [], []
+        for move in moves:
+            action, item, destination, file_extension = move
+            if item not in duplicates:
+                planned_moves.append(move)
+            elif self.duplicates_action == "skip":
+                self.skipped_files[str(item)] = f"duplicate of {duplicates[item]}"
+            elif self.duplicates_action == "hardlink": #moved duplicate is replaced with a link in one step, nothing is removed before it
+                planned_moves.append(move)
+                later_moves.append(("link", destination, destinations[duplicates[item]], file_extension))
             else:
-                going_through_folders_and_sorting_files_out(main_path_to_clean, item)  # going into subfolder
-                continue      
-        else: #item is a file
-            if check_if_extension_is_known(item.name): #check if extension is known
-                if normalize(item.name)[2].lower() in ARCHIVE_EXTENSIONS: #checks if file is an archive
-                    move_archive_file(item, main_path_to_clean)
-                else: # file with known extension, but not an archive
-                    move_known_file(item, main_path_to_clean)
+                duplicate_destination = self.names.reserve(self.destinations.destination("Duplicates", item.name))
+                planned_moves.append((action, item, duplicate_destination, file_extension))
+        if self.duplicates_action == "move":
+            planned_moves.insert(0, ("folder", None, self.destinations.folder("Duplicates"), None))
+        return planned_moves + later_moves
+
+    def plan_moves(self, files=None):
+        """Generator takes optional iterable of file paths as an argument
+        Yields a planned move (action, source, destination, extension) for every file given, by default for every file found
+        Before first move to a folder, yields ("folder", None, folder, None) so every folder is created only once
+        Destination names are unique, files with the same normalized name get "_1", "_2"... suffix
+        If sniff_workers > 0, files with unknown extension are detected by content in batches on a thread pool (sniffer if set)"""
+        planned_folders = set()
+        unknown_files = [] #files waiting for detection by content
+        sniffer, own_sniffer = self.sniffer if self.sniff_workers > 0 else None, False
+        if self.sniff_workers > 0 and sniffer is None:
+            from concurrent.futures import ThreadPoolExecutor
+            sniffer, own_sniffer = ThreadPoolExecutor(max_workers=self.sniff_workers), True
+        def with_folder(moves):
+            for move in moves:
+                if move[2].parent not in planned_folders:
+                    planned_folders.add(move[2].parent)
+                    yield ("folder", None, move[2].parent, None)
+                yield move
+        def sniffed_moves():
+            for item, sniffed_extension in zip(unknown_files, sniffer.map(sniff_file_type, unknown_files)):
+                yield self.plan_file(item, sniffed_extension)
+            unknown_files.clear()
+        if files is None:
+            files = self.walk_files()
+        file_index = self.open_index()
+        try:
+            for entry in files:
+                if file_index is not None and self.is_processed(entry):
+                    continue #file was already processed in previous run
+                item = Path(entry)
+                if sniffer is not None and not self.rules.is_known(item.name): #fast path stays a dictionary lookup
+                    unknown_files.append(item)
+                    if len(unknown_files) >= SNIFF_BATCH:
+                        yield from with_folder(sniffed_moves())
+                    continue
+                yield from with_folder([self.plan_file(item)])
+            if unknown_files:
+                yield from with_folder(sniffed_moves())
+        finally:
+            if own_sniffer:
+                sniffer.shutdown()
+        return
+
+    def exclude_file(self, path):
+        """Method takes path of a file written by the run (journal, plan) or skipped earlier as an argument, the file is never planned"""
+        self.own_files.add(os.path.abspath(os.fspath(path)))
+        return
+
+    def is_own_file(self, path):
+        """Checks if path belongs to a file written by the run itself"""
+        return os.path.abspath(os.fspath(path)) in self.own_files
+
+    def walk_files(self):
+        """Generator yields DirEntry of every file in folder to be cleaned, except files written by the run itself
+        Records number of items of every folder and order of folders, so empty folders are removed later without listing them again"""
+        self.folder_children.clear()
+        self.walked_folders.clear()
+        for entry in scan_folder(self.folder_to_clean, self.metrics, self.folder_children, self.designated_folders()):
+            if entry.is_dir(follow_symlinks=False): #folders are handled by delete_empty_folders
+                self.walked_folders.append(entry.path)
                 continue
-            else: # move file with unknown extension
-                move_unknown_file(item, main_path_to_clean)
+            if self.own_files and self.is_own_file(entry.path): #e.g. journal kept inside folder to be cleaned
                 continue
-    return main_path_to_clean
-
-def check_if_extension_is_known(name):
-    """Method takes a string (file name) as an argument
-    Returns True/False depending if extension is known"""
-    file_extension = normalize(name)[2] #generating file extension
-    if file_extension.lower() in KNOWN_EXTENSIONS:
-        return True
-    else:
-        return False
-    
-def move_unknown_file(item, path):
-    """Method takes an file path as argument
-    Method moves an unknown file to 'Unknown' folder without changing a name
-    Also adds an extension to a set to create a report later"""
-    file_extension = normalize(item.name)[2] #generating file extension
-    if not Path(f'{path}\\Unknown\\').exists(): #checks if Folder Unknown to exist and create it if necesary
-        os.makedirs(Path(f'{path}\\Unknown\\')) #create folder to move a file
-    shutil.move(item, Path(f'{path}\\Unknown\\{item.name}')) # move file to new location without changing a name
-    unknown_extensions_found.add(file_extension) #adds unknown extension to a set to create a raport later on
-    return
+            yield entry
+        return
 
-def move_archive_file(item, path):
-    """Method takes an file path as argument
-    Method unpacks an archive to an 'Archive' folder with new, normalized name
-    Also adds an extension to a set to create a report later"""
-    new_full_name, new_file_name, file_extension = normalize(item.name) #generating new name, also generating separated file name and extension
-    if not Path(f'{path}\\Archives\\').exists(): #checks if Folder Unknown to exist and create it if necesary
-        os.makedirs(Path(f'{path}\\Archives')) #create folder to move a file
-    shutil.unpack_archive(item, Path(f'{path}\\Archives\\{new_file_name}')) #unpack archive in subfolder with designated name
-    known_extensions_found.add(file_extension) #adds known archive extension to a set to create a raport later on    
-    os.remove(item) #delete unpacked file
-    return
+    def forget_file(self, item):
+        """Method takes path of a file moved out of its folder as an argument
+        Decreases number of items left in the folder"""
+        folder = os.path.dirname(item)
+        if folder in self.folder_children:
+            self.folder_children[folder] -= 1
+        return
 
-def move_known_file(item, path):
-    """Method takes an file path as argument
-    Method determine a file type and moves it to a designated folder with new, normalized name
-    Also adds an extension to a set to create a report later"""
-    new_full_name, new_file_name, file_extension = normalize(item.name) #generating new name, also generating separated file name and extension
-    for data_type, extension_list in DESIGNATED_FOLDERS.items(): #to determine type of a file
-        if file_extension.lower() in extension_list:
-            if not Path(f'{path}\{data_type}\\').exists(): #checks if Folder to move exist and create it if necesary
-                os.makedirs(Path(f'{path}\{data_type}')) #create folder to move a file
-            shutil.move(item, Path(f'{path}\{data_type}\{new_full_name}')) # move file to new location with new name
-            known_extensions_found.add(file_extension) #adds known extension to a set to create a raport later on
-    return
+    def delete_empty_folders(self):
+        """Method removes folders left empty by moves, subfolders before their parent, without recurence
+        Uses numbers of items recorded by the walk, so folders are not listed again and folders still holding files are skipped
+        If moves came without a walk (e.g. from a saved plan), folder to be cleaned is scanned instead"""
+        if not self.folder_children:
+            delete_empty_folders(self.folder_to_clean, self.metrics, self.designated_folders())
+            return
+        for folder in self.walked_folders:
+            if self.folder_children.get(folder): #folder still holds files, e.g. skipped archive
+                continue
+            if self.metrics is not None:
+                self.metrics.count("rmdir")
+            try:
+                os.rmdir(folder)
+            except OSError: #something appeared in the folder after the walk
+                continue
+            self.forget_file(folder)
+        return
 
-def delete_empty_folders(path):
-    """Takes directory as an argument
+    def is_processed(self, entry):
+        """Method takes DirEntry or path of a file as an argument
+        Returns True if file is the index itself or it was already processed in previous run and didnt change since"""
+        return self.file_index.is_index_file(entry) or self.file_index.is_unchanged(entry)
+
+    def plan_file(self, item, sniffed_extension=None):
+        """Method takes a file path and extension detected by content as arguments
+        Returns a planned move (action, source, destination, extension), destination name is reserved in name registry of the session
+        Action is "archive", "known" or "unknown"
+        File without extension, detected by content, gets detected extension
+        File with its own extension detected as an archive is moved as it is, never unpacked"""
+        start = time.perf_counter()
+        rules = self.rules #rules can be reloaded meanwhile
+        data_type, new_full_name, new_file_name, file_extension = classify(item.name, rules) #generating new name, also generating separated file name and extension
+        if self.metrics is not None:
+            self.metrics.observe("normalize", time.perf_counter() - start)
+        own_extension = file_extension
+        if sniffed_extension is not None:
+            data_type = rules.folder_of_extension(sniffed_extension)
+            if not file_extension: #name ends with "." after normalization
+                new_full_name = new_full_name[:-1] + "." + sniffed_extension
+            file_extension = sniffed_extension
+        action = rules.action(data_type)
+        if action == "unknown": #file with unknown extension keeps its name
+            new_name = item.name
+        elif action == "archive" and own_extension and sniffed_extension is not None: #e.g. epub or jar is a zip, but it is not unpacked
+            action, new_name = "known", item.name
+        elif action == "archive": #archive is unpacked in subfolder with normalized name, without extension
+            new_name = NOT_WORD_CHARACTER.sub("_", new_file_name.translate(TRANSLATION_TABLE))
+        else:
+            new_name = new_full_name
+        return (action, item, self.names.reserve(self.destinations.destination(data_type, new_name)), file_extension)
+
+    def run_moves(self, moves):
+        """Method takes iterable of planned moves as an argument
+        Executes moves one by one if workers == 1, otherwise on a thread pool
+        If extract_workers > 0, archives are unpacked on a process pool while other files are being moved
+        Only a limited number of moves is waiting in the pools, so planning doesnt run far ahead of moving"""
+        mover = extractor = None
+        if self.workers > 1 or self.extract_workers > 0: #pools are imported only when used, so serial runs start faster
+            from concurrent.futures import wait, as_completed, FIRST_COMPLETED
+        if self.workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            mover = ThreadPoolExecutor(max_workers=self.workers)
+        if self.extract_workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+            extractor = ProcessPoolExecutor(max_workers=self.extract_workers)
+        pending = set()
+        try:
+            for move in moves:
+                if move[0] == "link" and pending: #links need all other moves finished
+                    for future in as_completed(pending):
+                        self.record_move(future.result())
+                    pending = set()
+                future = self.dispatch_move(move, mover, extractor)
+                if future is None:
+                    continue
+                pending.add(future)
+                if len(pending) >= (self.workers + self.extract_workers) * 4: #waits for some moves to finish before planning next ones
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.record_move(future.result())
+            if pending:
+                for future in as_completed(pending):
+                    self.record_move(future.result())
+        finally:
+            for executor in (mover, extractor):
+                if executor is not None:
+                    executor.shutdown()
+            self.move_engine.flush() #sources of copied files are removed once copies are synced
+            if self.journal is not None:
+                self.journal.flush()
+        return
+
+    def dispatch_move(self, move, mover=None, extractor=None):
+        """Method takes a planned move, thread pool moving files and process pool unpacking archives (both optional) as arguments
+        Journals the move and starts it: archives are unpacked on extractor, other files are moved on mover
+        Folders, links and moves without a pool are executed and recorded at once, links have to be dispatched after other moves finished
+        Returns future of execute_move result, None if the move was already done"""
+        self.journal_move(move)
+        if move[0] == "archive" and extractor is not None: #unpacking is CPU-bound, so it goes to other process
+            return self.submit_archive(extractor, move)
+        if mover is not None and move[0] not in ("folder", "link"): #folders are created before any move to them is started
+            return mover.submit(self.apply_move, move)
+        self.record_move(self.apply_move(move))
+        return None
+
+    def apply_move(self, move):
+        """Method takes a planned move as an argument
+        Executes the move and returns it with a reason why it was skipped (None if it wasnt), its time in seconds and bytes moved"""
+        return execute_move(getattr(self, MOVE_ACTIONS[move[0]]), move)
+
+    def record_move(self, result):
+        """Method takes an executed move, reason why it was skipped, its time, bytes moved and unpacked files as an argument
+        Adds an extension to a set to create a report later"""
+        (action, item, destination, file_extension), skipped_reason, seconds, size, unpacked = result
+        if self.metrics is not None:
+            self.metrics.observe(STAGES.get(action, "move"), seconds, size)
+        if self.journal is not None and result[0] in self.journal_ids:
+            if skipped_reason is None and action == "archive":
+                self.move_engine.remove_later(item) #archive is removed after unpacked files were synced
+            self.journal.finished(self.journal_ids.pop(result[0]), skipped_reason)
+        if action == "folder": #folder is only timed and journaled, it is not a moved file
+            return
+        if skipped_reason is not None:
+            self.skipped_files[str(item)] = skipped_reason
+        else:
+            self.actions[action] = self.actions.get(action, 0) + 1
+            self.forget_file(item)
+            if action == "link": #moved duplicate was replaced with a link, it is already listed
+                return
+            elif action == "archive": #every unpacked file is listed, so the report doesnt walk unpacked folder
+                self.files.extend(unpacked)
+            else:
+                self.files.append((str(destination.parent), destination.name, size))
+            if action == "unknown":
+                self.unknown_extensions_found.add(file_extension) #adds unknown extension to a set to create a raport later on
+            else:
+                self.known_extensions_found.add(file_extension) #adds known extension to a set to create a raport later on
+        if self.file_index is not None:
+            self.index_move(action, item, destination, skipped_reason)
+        return
+
+    def index_move(self, action, item, destination, skipped_reason):
+        """Method takes executed move and reason why it was skipped as arguments
+        Saves moved file (or all files unpacked from an archive) in the index
+        Skipped file is saved as seen, so it is not processed again until it changes"""
+        if skipped_reason is not None:
+            if os.path.exists(item):
+                self.file_index.add_seen(item)
+        elif action == "archive":
+            self.file_index.add_folder(destination)
+        else:
+            self.file_index.add_file(destination)
+        return
+
+    def move_unknown_file(self, item, destination):
+        """Method takes an file path and its destination as arguments
+        Method moves an unknown file to 'Unknown' folder without changing a name"""
+        self.ensure_folder(destination.parent) #create folder Unknown if necesary
+        return self.move_engine.move(item, destination) # move file to new location without changing a name, returns its size
+
+    def move_archive_file(self, item, destination):
+        """Method takes an file path and its destination as arguments
+        Method unpacks an archive to an 'Archive' folder with new, normalized name
+        Returns list of (folder, name, bytes) of unpacked files
+        Raises ArchiveError if archive is broken or breaks extraction limits"""
+        self.ensure_folder(destination.parent) #create folder Archives if necesary
+        try:
+            unpacked = extract_archive(item, destination, self.extraction_limits, self.ensure_folder) #unpack archive in subfolder with designated name
+        except ArchiveError:
+            self.forget_folders(destination) #partially unpacked folders were removed
+            raise
+        if self.journal is None: #journaled archive is removed later by move engine
+            os.remove(item) #delete unpacked file
+        return unpacked
+
+    def move_known_file(self, item, destination):
+        """Method takes an file path and its destination as arguments
+        Method moves a file to a designated folder with new, normalized name"""
+        self.ensure_folder(destination.parent) #create folder to move a file if necesary
+        return self.move_engine.move(item, destination) # move file to new location with new name, returns its size
+
+    def link_duplicate(self, item, destination):
+        """Method takes path of a moved duplicate and path of the file it duplicates as arguments
+        Replaces the duplicate with hard link to the file, duplicate is left as it is if their content differs"""
+        replace_with_link(item, destination)
+        return
+
+    def create_folder(self, item, destination):
+        """Method takes None and path to a folder as arguments
+        Creates the folder if it doesnt exist"""
+        self.ensure_folder(destination)
+        return
+
+    def ensure_folder(self, folder):
+        """Method takes path to a folder as an argument
+        Creates the folder if it wasnt checked or created earlier in this session, so every folder is created at most once
+        Counts cache hits and misses in folder_cache_stats"""
+        key = os.path.abspath(folder)
+        with self.folder_cache_lock:
+            if key in self.created_folders:
+                self.folder_cache_stats["hits"] += 1
+                return folder
+            self.folder_cache_stats["misses"] += 1
+            if self.metrics is not None:
+                self.metrics.count("mkdir")
+            os.makedirs(key, exist_ok=True)
+            self.created_folders.add(key)
+        return folder
+
+    def reset_results(self):
+        """Method forgets moved and skipped files, executed moves and extensions found so far, so result holds only what was done since
+        Used by runs which never finish, e.g. before every watch batch, so the lists dont grow without limit"""
+        self.known_extensions_found = set()
+        self.unknown_extensions_found = set()
+        self.skipped_files = {}
+        self.actions = {}
+        self.files = []
+        return
+
+    def forget_cached_folders(self):
+        """Method forgets all folders checked or created so far and their devices, so they are checked again
+        Used when folders could be removed from outside of the run, e.g. between watch batches"""
+        with self.folder_cache_lock:
+            self.created_folders.clear()
+        self.move_engine.forget_devices()
+        return
+
+    def forget_folders(self, folder):
+        """Method takes path to a removed folder as an argument
+        Removes the folder and all its subfolders from folder cache"""
+        key = os.path.abspath(folder)
+        with self.folder_cache_lock:
+            for cached_folder in [cached for cached in self.created_folders if cached == key or cached.startswith(key + os.sep)]:
+                self.created_folders.discard(cached_folder)
+        return
+
+def going_through_folders_and_sorting_files_out(main_path_to_clean, workers=1, extract_workers=0):
+    """Funcion takes a path to folder to be cleaned, number of workers and number of extracting processes as arguments
+    Cleans the folder with a new CleanSession and returns its CleanResult"""
+    with CleanSession(main_path_to_clean, workers, extract_workers) as session:
+        return session.run()
+
+def execute_move(function, move, *arguments):
+    """Method takes function executing a move, planned move and extra arguments of the function as arguments
+    Executes the move and returns it with a reason why it was skipped (None if it wasnt), its time in seconds, bytes moved
+    and list of (folder, name, bytes) of files unpacked from an archive (None for other moves)"""
+    action, item, destination, file_extension = move
+    start = time.perf_counter()
+    try:
+        size = function(item, destination, *arguments) or 0
+    except (ArchiveError, MoveSkipped) as error: #archive or duplicate is left where it was
+        return move, str(error), time.perf_counter() - start, 0, None
+    except FileNotFoundError: #file from a saved plan is already gone
+        return move, "file not found", time.perf_counter() - start, 0, None
+    if isinstance(size, list): #archive returns its unpacked files
+        return move, None, time.perf_counter() - start, sum(file[2] for file in size), size
+    return move, None, time.perf_counter() - start, size, None
+
+def unpack_archive(item, destination, extraction_limits, remove_source=True):
+    """Method takes an archive path, its destination, extraction limits and information if archive should be removed as arguments
+    Unpacks an archive in a process of extracting pool, folder cache of the session is not used there"""
+    unpacked = extract_archive(item, destination, extraction_limits)
+    if remove_source:
+        os.remove(item) #delete unpacked file
+    return unpacked
+
+def write_plan(moves, plan_path, main_path_to_clean):
+    """Method takes iterable of planned moves, path to plan file and path to folder to be cleaned as arguments
+    Saves moves to the plan file one JSON line at a time, first line holds the folder to be cleaned
+    Returns number of saved moves"""
+    count = 0
+    with open(plan_path, "w", encoding="utf-8") as plan_file:
+        plan_file.write(json.dumps({"root": os.path.abspath(main_path_to_clean)}, ensure_ascii=False) + "\n")
+        for move in moves: #paths are saved as absolute, so plan can be applied from any folder
+            plan_file.write(json.dumps(encode_move(move), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def read_plan(plan_path):
+    """Method takes path to plan file saved by write_plan as an argument
+    Returns folder to be cleaned and generator of planned moves, plan is read one line at a time"""
+    with open(plan_path, encoding="utf-8") as plan_file:
+        root = Path(json.loads(plan_file.readline())["root"])
+    def moves():
+        with open(plan_path, encoding="utf-8") as plan_file:
+            plan_file.readline() #skips the line with folder to be cleaned
+            for line in plan_file:
+                yield decode_move(json.loads(line))
+    return root, moves()
+
+def delete_empty_folders(path, metrics=None, ignored=DESIGNATED_FOLDERS):
+    """Takes directory, optional Metrics and names of designated folders as arguments
     Method delete empty folders in a given directory
+    Subfolders are deleted before their parent folder, every folder is listed once
+    Folders still holding files are skipped
     Ignores designated folders"""
-    for item in path.iterdir():
-        if item.is_dir(): #checks if item is a folder
-            if item.name in DESIGNATED_FOLDERS.keys(): #ignoring certain folders
+    children = {} #folder path: number of items left in it
+    for entry in scan_folder(path, metrics, children, ignored):
+        if entry.is_dir(follow_symlinks=False): #checks if item is a folder
+            if children.get(entry.path): #folder still holds files, e.g. skipped archive
+                continue
+            if metrics is not None:
+                metrics.count("rmdir")
+            try:
+                os.rmdir(entry.path)
+            except OSError: #something appeared in the folder after it was listed
                 continue
-            else:                
-                if len(os.listdir(item)) == 0: #checks if folder is empty
-                    os.rmdir(item)
-                else:
-                    delete_empty_folders(item)  # going into subfolder
-                    os.rmdir(item) #delete a folder when all subfolders are gone
+            children[os.path.dirname(entry.path)] -= 1
     return
 
-def extensions_found_report():
-    """Funcions prints report of found extension and gives files list"""
-    if bool(unknown_extensions_found) or bool(known_extensions_found):
+def extensions_found_report(result):
+    """Funcions takes CleanResult as an argument and prints report of found extension and skipped files"""
+    if bool(result.unknown_extensions) or bool(result.known_extensions) or bool(result.skipped_files):
         print("\n")
         print('|{:^80}|'.format("-"*80))
-        if bool(unknown_extensions_found): #unknown extension report 
+        if bool(result.unknown_extensions): #unknown extension report
             print('|{:^80}|'.format("*****Unknown Extensions Found*****"))
             print('|{:^80}|'.format("-"*80))
-            for unknown_extension in unknown_extensions_found:
+            for unknown_extension in result.unknown_extensions:
                 print('|{:^80}|'.format(unknown_extension))
             print('|{:^80}|'.format("-"*80))
-        if bool(known_extensions_found):
+        if bool(result.known_extensions):
             print('|{:^80}|'.format("*****Known Extensions Found*****")) #known extensions report
             print('|{:^80}|'.format("-"*80))
-            for known_extension in known_extensions_found:
+            for known_extension in result.known_extensions:
                 print('|{:^80}|'.format(known_extension))
             print('|{:^80}|'.format("-"*80))
+        if bool(result.skipped_files):
+            print('|{:^80}|'.format("*****Skipped Files*****")) #files left where they were
+            print('|{:^80}|'.format("-"*80))
+            for skipped_file, reason in result.skipped_files.items():
+                print('|{:^80}|'.format(f"{skipped_file}: {reason}"))
+            print('|{:^80}|'.format("-"*80))
         print("\n")
         return
 
-def file_list_report(path):
-    """Method prints complete file list"""
-    for folder in DESIGNATED_FOLDERS: #going through main folders
-        if folder == "Archives":
-            if Path(f'{path}\{folder}\\').exists():
-                print('|{:^80}|'.format("-"*80))
-                print('|{:^80}|'.format(f"*****Folders in folder {folder}*****"))
-                print('|{:^80}|'.format("-"*80))
-                going_through_archive_folders_and_print_report(Path(f'{path}\\Archives\\')) #itering through archive folders
-        else: #any other folder
-            if Path(f'{path}\{folder}\\').exists():
-                print('|{:^80}|'.format("-"*80))
-                print('|{:^80}|'.format(f"*****Files in folder {folder}*****"))
-                print('|{:^80}|'.format("-"*80))
-                for file in Path(f'{path}\{folder}\\').iterdir():
-                    print('|{:^80}|'.format(file.name))
+def skipped_files_report(result):
+    """Funcion takes CleanResult as an argument and prints every skipped file with the reason on stderr
+    Used when the usual reports are not printed (quiet runs, watch batches), so skipped files are never silent"""
+    for skipped_file, reason in result.skipped_files.items():
+        print(f"Skipped {skipped_file}: {reason}", file=sys.stderr)
+    return
+
+def moves_report(result):
+    """Funcion takes CleanResult as an argument and prints number of files and bytes moved by renaming and by copying"""
     print('|{:^80}|'.format("-"*80))
-    print("\n")
+    print('|{:^80}|'.format("*****Moved Files*****"))
+    print('|{:^80}|'.format("-"*80))
+    for strategy, stats in result.transfers.items():
+        print('|{:^80}|'.format(f"{strategy}: {stats['files']} files, {stats['bytes']} bytes"))
     return
 
-def going_through_archive_folders_and_print_report(path): 
-    """Method takes path item as argument
-    Itering through all the Archive subfolders and printing file list"""
-    for item in path.iterdir():
-        if item.is_dir(): #check if item is a folder
-            print('|{:^80}|'.format(f'***Files in folder {item.name}***'))
-            print('|{:^80}|'.format("-"*80))
-            going_through_archive_folders_and_print_report(item)
-            continue
-        else:
-            print('|{:^80}|'.format(item.name))
+def start_profile(profile_path):
+    """Method takes path to profile file (None if not needed) as an argument
+    Starts profiling, returns profiler or None"""
+    if profile_path is None:
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def finish_profile(profiler, profile_path):
+    """Method saves profile stats"""
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
     return
-        
-def main():
-    folder_to_clean = check_argument()
-    going_through_folders_and_sorting_files_out(folder_to_clean)
-    delete_empty_folders(folder_to_clean)
-    extensions_found_report()
-    file_list_report(folder_to_clean)
-    exit()
+
+def build_parser():
+    """Function returns parser of command line options
+    Performance options map straight onto CleanSession and its moving and extracting pools"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="clean_folder",
+        description="Sorts files of a folder into designated folders according to their extensions",
+        epilog="Exit codes: 0 - folders were cleaned, 1 - run failed, 2 - wrong options. Script never asks for input.",
+    )
+    parser.add_argument("folders", nargs="*", type=Path, metavar="FOLDER", help="folder to clean, more folders are cleaned at once on shared pools")
+    parser.add_argument("--roots", metavar="FILE", help="file listing folders to clean, one per line")
+    parser.add_argument("-q", "--quiet", action="store_true", help="print only errors, file list is still written to --report-file")
+    performance = parser.add_argument_group("performance")
+    performance.add_argument("--workers", type=number_argument(1), default=1, help="threads moving files, 1 moves files one by one (default: 1)")
+    performance.add_argument("--extract-workers", type=number_argument(0), default=0, help="processes unpacking archives, 0 unpacks them with moving threads (default: 0)")
+    performance.add_argument("--sniff", action="store_true", help="detect type of files with unknown extension by their content")
+    performance.add_argument("--index", metavar="FILE", help="index of processed files, next runs process only new or changed files")
+    limits = parser.add_argument_group("extraction limits")
+    limits.add_argument("--max-extract-size", type=number_argument(1), default=DEFAULT_LIMITS["max_size"], metavar="BYTES", help="bytes unpacked from one archive (default: %(default)s)")
+    limits.add_argument("--max-members", type=number_argument(1), default=DEFAULT_LIMITS["max_members"], metavar="NUMBER", help="members of one archive (default: %(default)s)")
+    limits.add_argument("--max-ratio", type=number_argument(1), default=DEFAULT_LIMITS["max_ratio"], metavar="NUMBER", help="compression ratio of one archive (default: %(default)s)")
+    modes = parser.add_argument_group("modes")
+    plans = modes.add_mutually_exclusive_group()
+    plans.add_argument("--dry-run", metavar="PLAN", help="only save planned moves to PLAN, nothing is moved")
+    plans.add_argument("--apply-plan", metavar="PLAN", help="run moves saved with --dry-run")
+    plans.add_argument("--resume", metavar="JOURNAL", help="continue run stopped before it finished")
+    modes.add_argument("--journal", metavar="JOURNAL", help="journal of moves, which lets an interrupted run be resumed")
+    modes.add_argument("--dedup", choices=DUPLICATES_ACTIONS, help="what to do with files with the same content")
+    modes.add_argument("--rules", metavar="FILE", help="TOML or JSON file with more extensions, suffixes and patterns")
+    modes.add_argument("--watch", action="store_true", help="keep cleaning files as they appear")
+    modes.add_argument("--settle", type=number_argument(0), default=2, metavar="SECONDS", help="seconds without changes before watched file is moved (default: 2)")
+    modes.add_argument("--serve", metavar="SOCKET", help="run resident server used by clients started with CLEAN_FOLDER_SOCKET")
+    output = parser.add_argument_group("output")
+    output.add_argument("--report", choices=REPORT_FORMATS, default="text", help="format of file list (default: text)")
+    output.add_argument("--report-file", metavar="FILE", help="write file list to FILE instead of printing it")
+    output.add_argument("--metrics", metavar="FILE", help="save metrics of the run to FILE")
+    output.add_argument("--metrics-format", choices=METRICS_FORMATS, default="json", help="format of metrics (default: json)")
+    output.add_argument("--profile", metavar="FILE", help="save cProfile stats of the run to FILE")
+    return parser
+
+def session_options(options):
+    """Function takes parsed command line options as an argument
+    Returns options of CleanSession shared by runs of one folder and of many folders"""
+    return {
+        "extraction_limits": {"max_size": options.max_extract_size, "max_members": options.max_members, "max_ratio": options.max_ratio},
+        "sniff": options.sniff, #detects type of files with unknown extension by content
+        "duplicates_action": options.dedup,
+        "rules_path": options.rules,
+    }
+
+def main(argv=None):
+    """Console entry point, takes list of command line arguments (sys.argv if not given) as an argument
+    Runs CleanSession and prints its reports, never asks for input
+    Returns exit code, wrong options exit with code 2"""
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if options.serve is not None: #resident server, used by clients started with CLEAN_FOLDER_SOCKET set
+        from clean_folder.server import serve
+        serve(options.serve)
+        return EXIT_OK
+    if options.rules is not None:
+        try:
+            load_rules(options.rules, DEFAULT_RULES)
+        except (OSError, ValueError, re.error) as error: #also broken JSON or TOML
+            print(f"Rules file {options.rules} was not loaded: {error}", file=sys.stderr)
+            return EXIT_FAILURE
+    if options.roots is not None or len(options.folders) > 1: #many folders are cleaned at once on shared pools
+        if options.watch or options.dry_run or options.apply_plan or options.resume or options.journal or options.index or options.dedup:
+            parser.error("many folders cant be cleaned with --watch, --dry-run, --apply-plan, --resume, --journal, --index or --dedup")
+        from clean_folder.batch import read_roots, run_batch
+        try:
+            roots = options.folders + (read_roots(options.roots) if options.roots is not None else [])
+        except OSError as error:
+            print(f"List of folders was not read: {error}", file=sys.stderr)
+            return EXIT_FAILURE
+        profiler = start_profile(options.profile)
+        try:
+            return run_batch(roots, options.workers, options.extract_workers, options.metrics, options.metrics_format, options.report, options.report_file, options.quiet, **session_options(options))
+        finally:
+            finish_profile(profiler, options.profile)
+    if options.watch and options.dedup: #batches of watch are planned without other files, duplicates wouldnt be found
+        parser.error("--dedup cant be used with --watch")
+    moves, journal_path = None, options.journal
+    if options.resume is not None or options.apply_plan is not None:
+        if options.folders:
+            parser.error("folder to clean is read from --resume or --apply-plan file, it cant be given")
+        try:
+            if options.resume is not None:
+                folder_to_clean, journal_path = journal_root(options.resume), options.resume
+            else: #runs moves from a plan saved with --dry-run
+                folder_to_clean, moves = read_plan(options.apply_plan)
+        except (OSError, ValueError, KeyError) as error: #missing or broken file
+            print(f"File {options.resume or options.apply_plan} was not read: {error}", file=sys.stderr)
+            return EXIT_FAILURE
+    elif not options.folders:
+        parser.error("folder to clean is required")
+    else:
+        folder_to_clean = options.folders[0]
+    if not folder_to_clean.is_dir(): #checks if argument is a valid directory
+        print(f"Argument is not a correct directory: {folder_to_clean}", file=sys.stderr)
+        return EXIT_FAILURE
+    if options.journal is not None:
+        try:
+            check_journal(options.journal, folder_to_clean)
+        except (OSError, ValueError, KeyError) as error: #journal of other folder, unfinished run or broken file
+            print(f"Journal {options.journal} cant be used: {error}", file=sys.stderr)
+            return EXIT_FAILURE
+    if not options.quiet:
+        print(f"Folder to clean: {folder_to_clean}")
+    profiler = start_profile(options.profile)
+    session = CleanSession(folder_to_clean, options.workers, options.extract_workers, index_path=options.index, collect_metrics=options.metrics is not None, journal_path=journal_path, **session_options(options))
+    try:
+        if options.dry_run is not None: #only saves a plan, nothing is moved
+            session.exclude_file(options.dry_run) #plan can be saved inside folder to clean
+            count = write_plan(session.plan_folder(), options.dry_run, folder_to_clean)
+            if not options.quiet:
+                print(f"Plan with {count} operations saved to {options.dry_run}")
+            return EXIT_OK
+        if options.resume is not None:
+            result = session.resume()
+        elif moves is not None:
+            session.exclude_file(options.apply_plan)
+            result = session.apply_plan(moves)
+        else: #incremental run if index is given, only new or changed files are processed
+            result = session.run()
+        with session.stage_timer("report"):
+            if not options.quiet:
+                extensions_found_report(result)
+                moves_report(result)
+            else:
+                skipped_files_report(result)
+            if not options.quiet or options.report_file is not None:
+                rows = index_rows(session.file_index, folder_to_clean) if session.file_index is not None else moved_rows(result.files) #in incremental runs list comes from the index
+                write_report(rows, options.report, options.report_file)
+        if options.watch: #keeps cleaning files as they appear
+            from clean_folder.watch import watch_folder
+            watch_folder(session, options.settle, options.quiet)
+    finally:
+        finish_profile(profiler, options.profile)
+        if session.metrics is not None:
+            session.metrics.write(options.metrics, options.metrics_format)
+        session.close()
+    return EXIT_OK
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
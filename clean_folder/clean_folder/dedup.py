@@ -0,0 +1,56 @@
+import os
+import mmap
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+BLOCK_SIZE = 64 * 1024 #size of first and last block hashed by partial_hash
+CHUNK_SIZE = 1024 * 1024 #full_hash feeds mapped file to hash in chunks of this size
+
+def partial_hash(path):
+    """Function takes a file path as an argument
+    Returns hash of the first and the last block of a file"""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        digest.update(os.pread(file.fileno(), BLOCK_SIZE, 0))
+        if size > BLOCK_SIZE:
+            digest.update(os.pread(file.fileno(), BLOCK_SIZE, max(size - BLOCK_SIZE, BLOCK_SIZE)))
+    return digest.hexdigest()
+
+def full_hash(path):
+    """Function takes a file path as an argument
+    Returns hash of whole file, file is read through memory map"""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0: #empty file cant be mapped
+            return digest.hexdigest()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for start in range(0, size, CHUNK_SIZE):
+                    digest.update(view[start:start + CHUNK_SIZE])
+    return digest.hexdigest()
+
+def group_by(paths, key):
+    """Function groups paths by key, keeping their order, and returns only groups with more than one path"""
+    groups = {}
+    for path in paths:
+        groups.setdefault(key(path), []).append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+def find_duplicates(paths, workers=None):
+    """Function takes list of file paths and number of hashing processes as arguments
+    Groups files by size, then by hash of first and last block, then by hash of whole file
+    Only files still matching after a stage are hashed in the next one, hashing runs on a process pool
+    Returns dictionary duplicate path: path of the first file with the same content"""
+    candidates = group_by(paths, os.path.getsize)
+    if candidates:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for stage in (partial_hash, full_hash):
+                files = [path for group in candidates for path in group]
+                hashes = dict(zip(files, pool.map(stage, files, chunksize=16)))
+                candidates = [same_hash for group in candidates for same_hash in group_by(group, hashes.get)]
+    duplicates = {}
+    for group in candidates:
+        for duplicate in group[1:]:
+            duplicates[duplicate] = group[0]
+    return duplicates
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+COMMIT_EVERY = 1000 #index is committed after this many changes
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, folder TEXT, name TEXT);
+CREATE INDEX IF NOT EXISTS files_by_folder ON files (folder, name);
+CREATE TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER);
+CREATE TABLE IF NOT EXISTS folders (folder TEXT PRIMARY KEY, mtime INTEGER);
+"""
+
+class FileIndex:
+    """Persistent index of already processed files, kept in sqlite database
+    Table files holds files sorted into designated folders, used for the file list report
+    Table seen holds files left in folder to clean (e.g. skipped archives), so they are not processed again until they change
+    Table folders holds mtime of every folder of table files when its files were last checked, so removed files are found
+    without listing unchanged folders"""
+
+    def __init__(self, index_path, root):
+        self.path = os.path.abspath(index_path)
+        self.root = os.path.abspath(root)
+        self.is_new = not os.path.exists(self.path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        self.seen = {path: (size, mtime, inode) for path, size, mtime, inode in self.connection.execute("SELECT path, size, mtime, inode FROM seen")}
+        self.changes = 0
+
+    def is_index_file(self, path):
+        """Checks if path belongs to the index database itself (also its journal)"""
+        return os.path.abspath(os.fspath(path)).startswith(self.path)
+
+    def is_unchanged(self, entry):
+        """Takes DirEntry or Path of a file as an argument
+        Returns True if file was already processed and its size, mtime and inode didnt change since
+        File is stated only if it is in the index"""
+        path = os.path.abspath(os.fspath(entry))
+        if path not in self.seen:
+            return False
+        stat = entry.stat(follow_symlinks=False)
+        return self.seen[path] == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def add_seen(self, path):
+        """Takes path to a file left in folder to clean as an argument and saves it in the index"""
+        path = os.path.abspath(path)
+        stat = os.stat(path, follow_symlinks=False)
+        self.seen[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        self.execute("INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?)", (path, *self.seen[path]))
+
+    def add_file(self, path):
+        """Takes path to a file in designated folder as an argument and saves it in the index"""
+        path = os.path.abspath(path)
+        stat = os.stat(path, follow_symlinks=False)
+        folder = os.path.relpath(os.path.dirname(path), self.root)
+        self.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, folder, os.path.basename(path)))
+
+    def add_folder(self, folder):
+        """Takes path to a folder as an argument and saves all files inside it in the index"""
+        for current_folder, subfolders, files in os.walk(folder):
+            for name in files:
+                self.add_file(os.path.join(current_folder, name))
+
+    def prune(self):
+        """Removes files which are gone from the index
+        Every folder is stated once, only folders changed since they were last checked are listed"""
+        checked = dict(self.connection.execute("SELECT folder, mtime FROM folders"))
+        for (folder,) in self.connection.execute("SELECT DISTINCT folder FROM files").fetchall():
+            path = os.path.join(self.root, folder)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except (FileNotFoundError, NotADirectoryError): #whole folder was removed
+                self.execute("DELETE FROM files WHERE folder = ?", (folder,))
+                self.execute("DELETE FROM folders WHERE folder = ?", (folder,))
+                continue
+            if checked.get(folder) == mtime:
+                continue
+            with os.scandir(path) as entries:
+                names = {entry.name for entry in entries}
+            for (name,) in self.connection.execute("SELECT name FROM files WHERE folder = ?", (folder,)).fetchall():
+                if name not in names:
+                    self.execute("DELETE FROM files WHERE folder = ? AND name = ?", (folder, name))
+            self.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, mtime))
+        return
+
+    def files(self):
+        """Generator yields (folder relative to folder to clean, file name, bytes) of every file in designated folders, ordered by folder
+        Files which are gone are removed from the index first"""
+        self.prune()
+        yield from self.connection.execute("SELECT folder, name, size FROM files ORDER BY folder, name")
+
+    def execute(self, statement, values):
+        """Runs a statement changing the index, commits every COMMIT_EVERY changes"""
+        self.connection.execute(statement, values)
+        self.changes += 1
+        if self.changes % COMMIT_EVERY == 0:
+            self.connection.commit()
+
+    def close(self):
+        """Commits all changes and closes the index"""
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,147 @@
+import os
+import json
+import threading
+from pathlib import Path
+JOURNAL_BATCH = 256 #journal is fsynced after this many records
+
+def encode_move(move):
+    """Function takes a planned move as an argument and returns it as a dictionary with absolute paths"""
+    action, item, destination, file_extension = move
+    return {"action": action, "source": None if item is None else os.path.abspath(item), "destination": os.path.abspath(destination), "extension": file_extension}
+
+def decode_move(record):
+    """Function takes a dictionary saved by encode_move as an argument and returns planned move"""
+    item = None if record["source"] is None else Path(record["source"])
+    return (record["action"], item, Path(record["destination"]), record["extension"])
+
+class Journal:
+    """Append-only JSON lines journal of a run
+    First line holds the folder to be cleaned, then every operation is saved once when it is started
+    and once more when it is finished or skipped
+    Every record is passed to the system at once, so it survives the process being killed
+    Records are fsynced in batches, only start of unpacking an archive is fsynced at once, as unpacking it twice is expensive"""
+
+    def __init__(self, path, root, next_id=None):
+        self.path = path
+        self.unsynced = 0
+        self.lock = threading.Lock()
+        self.next_id = check_journal(path, root, next_id is not None)
+        if next_id is not None:
+            self.next_id = max(self.next_id, next_id)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8", buffering=1) #line buffered
+        if is_new:
+            self.write({"root": os.path.abspath(root)})
+            self.flush()
+        elif not ends_with_newline(path): #last record was cut by a crash, new records start on their own line
+            self.file.write("\n")
+
+    def started(self, move):
+        """Saves a move which is about to be executed, returns its id"""
+        with self.lock:
+            move_id = self.next_id
+            self.next_id += 1
+        self.write(dict(encode_move(move), id=move_id), move[0] == "archive")
+        return move_id
+
+    def finished(self, move_id, skipped_reason=None):
+        """Saves that move with given id was executed or skipped"""
+        self.write({"done": move_id, "skipped": skipped_reason})
+
+    def write(self, record, sync=False):
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.unsynced += 1
+            if sync or self.unsynced >= JOURNAL_BATCH:
+                self.sync()
+
+    def sync(self):
+        """Writes buffered records to disk, lock has to be held"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def flush(self):
+        """Writes all buffered records to disk, called at the end of a run"""
+        with self.lock:
+            self.sync()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def check_journal(path, root, resume=False):
+    """Function takes path to a journal, folder to be cleaned and information if the run is resumed as arguments
+    Journal can be used again only by a run of the same folder, and only when its last run finished, unless it is resumed
+    Returns next free id, raises ValueError if the journal cant be used"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    if os.path.abspath(journal_root(path)) != os.path.abspath(root):
+        raise ValueError(f"journal {path} belongs to {journal_root(path)}, not to {root}")
+    records, next_id = read_journal(path)
+    if not resume and not all(finished or move[0] == "folder" for move_id, move, finished, skipped_reason in records): #folders are created again anyway
+        raise ValueError(f"journal {path} holds a run which didnt finish, continue it with --resume")
+    return next_id
+
+def ends_with_newline(path):
+    """Returns True if the last byte of a file is a newline"""
+    with open(path, "rb") as journal_file:
+        journal_file.seek(-1, os.SEEK_END)
+        return journal_file.read(1) == b"\n"
+
+def journal_root(path):
+    """Function takes path to a journal as an argument and returns folder to be cleaned saved in its first line"""
+    with open(path, encoding="utf-8") as journal_file:
+        return Path(json.loads(journal_file.readline())["root"])
+
+def read_journal(path):
+    """Function takes path to a journal as an argument
+    Returns list of (id, move, finished, skipped reason) in order of starting and next free id
+    Line cut by a crash at the end of the journal is ignored"""
+    moves, results = {}, {}
+    with open(path, encoding="utf-8") as journal_file:
+        journal_file.readline() #skips the line with folder to be cleaned
+        for line in journal_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError: #record cut by a crash, records of a later run follow it
+                continue
+            if "done" in record:
+                results[record["done"]] = record["skipped"]
+            else:
+                moves[record["id"]] = decode_move(record)
+    records = [(move_id, move, move_id in results, results.get(move_id)) for move_id, move in sorted(moves.items())]
+    return records, max(moves, default=-1) + 1
+
+def recover_move(move, finished):
+    """Function takes a move from the journal and information if it was finished as arguments
+    Checks what part of the move was done before the run was stopped
+    Returns the move if it has to be executed again, None if it is complete
+    Partial results (half copied file, partly unpacked archive) are removed before the move is executed again"""
+    action, item, destination, file_extension = move
+    if action == "folder":
+        return move
+    if item is None or not os.path.lexists(item): #source is gone, so the move was completed
+        return None
+    if action == "link": #duplicate is replaced with a link in one rename
+        return None if os.path.lexists(destination) and os.path.samefile(item, destination) else move
+    if action == "archive":
+        if os.path.isdir(destination): #partly unpacked, or unpacked but archive wasnt removed before the run was stopped
+            import shutil
+            shutil.rmtree(destination)
+        return move
+    if not os.path.lexists(destination):
+        return move
+    source_stat, destination_stat = os.lstat(item), os.lstat(destination)
+    if (source_stat.st_size, source_stat.st_mtime_ns) == (destination_stat.st_size, destination_stat.st_mtime_ns): #copy was complete, only source wasnt removed
+        fd = os.open(destination, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.remove(item)
+        return None
+    if finished: #file with the same name appeared after the move, it is left for the next run
+        return None
+    os.remove(destination) #half copied file
+    return move
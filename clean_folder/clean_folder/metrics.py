@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import threading
+import contextlib
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10) #upper bounds in seconds, last bucket is +Inf
+METRICS_FORMATS = ("json", "prometheus")
+
+class Metrics:
+    """Per-stage counters of one run: number of files, bytes, busy time and latency histogram
+    Also counts filesystem calls made by clean_folder
+    Safe to update from many threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}
+        self.syscalls = {}
+        self.lock = threading.Lock()
+
+    def new_stage(self):
+        return {"files": 0, "bytes": 0, "seconds": 0.0, "wall_seconds": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+
+    def observe(self, stage, seconds, size=0, files=1):
+        """Records one operation of a stage, which took seconds and handled size bytes"""
+        bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            counters = self.stages.setdefault(stage, self.new_stage())
+            counters["files"] += files
+            counters["bytes"] += size
+            counters["seconds"] += seconds
+            counters["buckets"][bucket] += 1
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """Context manager adding wall time of a block to a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages.setdefault(stage, self.new_stage())["wall_seconds"] += time.perf_counter() - start
+
+    def count(self, syscall, number=1):
+        """Counts filesystem calls of one kind"""
+        with self.lock:
+            self.syscalls[syscall] = self.syscalls.get(syscall, 0) + number
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        """Returns dictionary with all counters, files/s and bytes/s of every stage"""
+        wall = (self.finished or time.perf_counter()) - self.started
+        stages = {}
+        with self.lock:
+            for stage, counters in self.stages.items():
+                stage_wall = counters["wall_seconds"] or wall #stages without own timer are spread over whole run
+                stages[stage] = {
+                    "files": counters["files"],
+                    "bytes": counters["bytes"],
+                    "busy_seconds": round(counters["seconds"], 6),
+                    "wall_seconds": round(stage_wall, 6),
+                    "files_per_second": round(counters["files"] / stage_wall, 1) if stage_wall else None,
+                    "bytes_per_second": round(counters["bytes"] / stage_wall, 1) if stage_wall else None,
+                    "latency_histogram": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], counters["buckets"])),
+                }
+            return {"wall_seconds": round(wall, 6), "stages": stages, "syscalls": dict(self.syscalls)}
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self):
+        """Returns metrics in Prometheus textfile collector format"""
+        summary = self.summary()
+        stages = summary["stages"]
+        lines = ["# TYPE clean_folder_run_seconds gauge", f"clean_folder_run_seconds {summary['wall_seconds']}"]
+        for family, kind, key in (("files_total", "counter", "files"), ("bytes_total", "counter", "bytes"), ("wall_seconds", "gauge", "wall_seconds")):
+            lines.append(f"# TYPE clean_folder_stage_{family} {kind}")
+            lines.extend(f'clean_folder_stage_{family}{{stage="{stage}"}} {counters[key]}' for stage, counters in stages.items())
+        lines.append("# TYPE clean_folder_stage_latency_seconds histogram")
+        for stage, counters in stages.items():
+            cumulative = 0
+            for bound, number in counters["latency_histogram"].items():
+                cumulative += number
+                lines.append(f'clean_folder_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'clean_folder_stage_latency_seconds_sum{{stage="{stage}"}} {counters["busy_seconds"]}')
+            lines.append(f'clean_folder_stage_latency_seconds_count{{stage="{stage}"}} {cumulative}')
+        lines.append("# TYPE clean_folder_syscalls_total counter")
+        lines.extend(f'clean_folder_syscalls_total{{call="{syscall}"}} {number}' for syscall, number in summary["syscalls"].items())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, metrics_format="json"):
+        """Saves metrics to a file in json or prometheus format"""
+        self.finish()
+        text = self.to_prometheus() if metrics_format == "prometheus" else self.to_json()
+        with open(f"{path}.tmp", "w", encoding="utf-8") as metrics_file: #textfile collector must never see half-written file
+            metrics_file.write(text)
+        os.replace(f"{path}.tmp", path)
+        return path
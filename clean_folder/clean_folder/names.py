@@ -0,0 +1,104 @@
+import os
+import threading
+from pathlib import Path
+
+class DestinationFolders:
+    """Designated folders of one folder to clean
+    Path of every designated folder is joined with pathlib once per run and kept, destinations are built from them
+    by joining, so folders are separated the way the system expects"""
+
+    def __init__(self, root, categories=()):
+        self.root = Path(root)
+        self.folders = {} #designated folder name: its path
+        for data_type in categories:
+            self.folder(data_type)
+
+    def folder(self, data_type):
+        """Method takes name of designated folder as an argument and returns its path"""
+        folder = self.folders.get(data_type)
+        if folder is None: #category added by rules loaded again
+            folder = self.folders.setdefault(data_type, self.root / data_type)
+        return folder
+
+    def destination(self, data_type, name):
+        """Method takes name of designated folder and new name of a file as arguments and returns destination path"""
+        return self.folder(data_type) / name
+
+class NameRegistry:
+    """Names taken in destination folders, so every planned move gets a unique destination
+    Every folder is listed with one scandir the first time a name in it is asked for, candidate names are never stated
+    Last "_N" suffix given to every name is remembered, so the next file with the same name gets its suffix at once
+    Thread-safe, so it can be shared by planners running in parallel"""
+
+    def __init__(self, metrics=None):
+        self.folders = {} #folder: set of names taken in it
+        self.mtimes = {} #folder: st_mtime_ns when it was listed, None if it didnt exist
+        self.counters = {} #folder: {name: last suffix number given to the name}
+        self.touched = set() #folders names were reserved in since last checkpoint
+        self.lock = threading.Lock()
+        self.metrics = metrics
+
+    def taken_names(self, folder):
+        """Returns set of names taken in a folder, listing the folder the first time, lock has to be held"""
+        names = self.folders.get(folder)
+        if names is None:
+            self.mtimes[folder] = folder_mtime(folder) #stated before listing, so changes made during listing are seen later
+            try:
+                with os.scandir(folder) as entries:
+                    names = {entry.name for entry in entries}
+            except (FileNotFoundError, NotADirectoryError): #folder will be created by the run
+                names = set()
+            if self.metrics is not None:
+                self.metrics.count("scandir")
+            self.folders[folder] = names
+        return names
+
+    def reserve(self, destination):
+        """Method takes a destination path as an argument
+        Returns destination with a name not taken in its folder, adding "_1", "_2"... to the name if necessary
+        Returned name is marked as taken"""
+        folder, name = destination.parent, destination.name
+        with self.lock:
+            names = self.taken_names(folder)
+            self.touched.add(folder)
+            if name not in names:
+                names.add(name)
+                return destination
+            counters = self.counters.setdefault(folder, {})
+            counter = counters.get(name, 0)
+            while True: #loops again only if a file already had a suffixed name
+                counter += 1
+                candidate = f'{destination.stem}_{counter}{destination.suffix}'
+                if candidate not in names:
+                    break
+            counters[name] = counter
+            names.add(candidate)
+        return destination.with_name(candidate)
+
+    def checkpoint(self):
+        """Records mtime of folders names were reserved in, called after moves to them were done
+        so changes made by the run itself dont make the folders listed again"""
+        with self.lock:
+            for folder in self.touched:
+                if folder in self.folders:
+                    self.mtimes[folder] = folder_mtime(folder)
+            self.touched.clear()
+        return
+
+    def refresh(self):
+        """Forgets folders changed since they were listed or checkpointed, so only they are listed again when next name is asked for
+        Every listed folder is stated once, used when files could appear in destination folders from outside of the run,
+        e.g. between watch batches"""
+        with self.lock:
+            for folder, mtime in list(self.mtimes.items()):
+                if folder_mtime(folder) != mtime:
+                    del self.folders[folder], self.mtimes[folder]
+                    self.counters.pop(folder, None)
+        return
+
+def folder_mtime(folder):
+    """Returns st_mtime_ns of a folder, None if it doesnt exist"""
+    try:
+        return os.stat(folder).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        return None
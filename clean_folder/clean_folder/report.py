@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import json
+REPORT_FORMATS = ("text", "jsonl", "csv", "summary")
+BUFFER_SIZE = 1024 * 1024 #report is written in chunks of about this size
+LINE = '|{:^80}|'.format("-"*80)
+
+def moved_rows(files):
+    """Generator takes list of (folder, name, bytes) of files moved or unpacked by a run as an argument
+    Yields (folder, name, bytes) of every file sorted by folder, nothing is walked again"""
+    yield from sorted(files)
+    return
+
+def index_rows(file_index, root):
+    """Generator takes FileIndex and folder to clean as arguments and yields (folder, name, bytes) of every file saved in the index
+    Folders are joined with folder to clean, the same way moved_rows lists them"""
+    root = os.fspath(root)
+    for folder, name, size in file_index.files():
+        yield os.path.join(root, folder), name, size
+    return
+
+def summary_rows(rows):
+    """Function takes iterable of (folder, name, bytes) as an argument
+    Returns list of (folder, number of files, bytes) of every folder"""
+    folders = {}
+    for folder, name, size in rows:
+        counters = folders.setdefault(folder, [0, 0])
+        counters[0] += 1
+        counters[1] += size or 0
+    return [(folder, files, size) for folder, (files, size) in sorted(folders.items())]
+
+def text_lines(rows):
+    """Generator yields lines of file list in text format, with a header before files of every folder"""
+    current_folder = None
+    for folder, name, size in rows:
+        if folder != current_folder: #first file of next folder
+            current_folder = folder
+            yield LINE + "\n"
+            yield '|{:^80}|\n'.format(f"*****Files in folder {folder}*****")
+            yield LINE + "\n"
+        yield '|{:^80}|\n'.format(name)
+    yield LINE + "\n"
+    yield "\n"
+
+def jsonl_lines(rows):
+    """Generator yields one JSON line of every file"""
+    for folder, name, size in rows:
+        yield json.dumps({"folder": folder, "name": name, "bytes": size}, ensure_ascii=False) + "\n"
+
+def csv_lines(rows):
+    """Generator yields CSV lines, header first"""
+    import csv
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(("folder", "name", "bytes"))
+    for folder, name, size in rows:
+        writer.writerow((folder, name, "" if size is None else size))
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    if line.tell(): #no files, only header was written
+        yield line.getvalue()
+    return
+
+def summary_lines(rows):
+    """Generator yields lines of summary: number of files and bytes in every folder"""
+    totals = [0, 0]
+    yield LINE + "\n"
+    yield '|{:^80}|\n'.format("*****Files Summary*****")
+    yield LINE + "\n"
+    for folder, files, size in summary_rows(rows):
+        totals[0] += files
+        totals[1] += size
+        yield '|{:^80}|\n'.format(f"{folder}: {files} files, {size} bytes")
+    yield LINE + "\n"
+    yield '|{:^80}|\n'.format(f"Total: {totals[0]} files, {totals[1]} bytes")
+    yield LINE + "\n"
+
+REPORT_LINES = {"text": text_lines, "jsonl": jsonl_lines, "csv": csv_lines, "summary": summary_lines}
+
+def write_report(rows, report_format="text", report_path=None):
+    """Function takes iterable of (folder, name, bytes), report format and path to report file (None prints it) as arguments
+    Writes the report in chunks, so neither the report nor the list of files has to be kept in memory at once
+    Returns number of written characters"""
+    output = sys.stdout if report_path is None else open(report_path, "w", encoding="utf-8", newline="", buffering=BUFFER_SIZE)
+    written = 0
+    try:
+        chunk, chunk_size = [], 0
+        for line in REPORT_LINES[report_format](rows):
+            chunk.append(line)
+            chunk_size += len(line)
+            if chunk_size >= BUFFER_SIZE:
+                written += output.write("".join(chunk))
+                chunk, chunk_size = [], 0
+        written += output.write("".join(chunk))
+    finally:
+        if report_path is not None:
+            output.close()
+    return written
@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import fnmatch
+RULE_ACTIONS = ("known", "archive") #what is done with files of a category, "unknown" is reserved for files without category
+
+class Rules:
+    """Compiled extension rules deciding designated folder of a file
+    Every category (designated folder) can have extensions ("jpg"), compound suffixes ("tar.gz")
+    and patterns matched against whole file name: globs ("IMG_*") and regular expressions ("re:^invoice_\\d+")
+    Extensions and suffixes are compiled into one dictionary, patterns into one combined regular expression,
+    so cost of classifying a file doesnt grow with number of extensions"""
+
+    def __init__(self, categories, actions=None, path=None, mtime=None):
+        self.categories = categories
+        self.path = path #rules file the rules were loaded from, None for built-in rules
+        self.mtime = mtime
+        self.actions = dict(actions or {}) #folder: action, folders without action are "known"
+        self.suffixes = {} #lowercase extension or compound suffix without leading dot: folder
+        patterns, self.pattern_folders = [], {}
+        for folder, rule in categories.items():
+            if rule.get("action") is not None:
+                if rule["action"] not in RULE_ACTIONS:
+                    raise ValueError(f"action of {folder} needs to be one of: {', '.join(RULE_ACTIONS)}")
+                self.actions[folder] = rule["action"]
+            for suffix in rule_values(folder, rule, "extensions") + rule_values(folder, rule, "suffixes"):
+                self.suffixes[suffix.lower().lstrip(".")] = folder
+            for pattern in rule_values(folder, rule, "patterns"):
+                group = f"p{len(patterns)}"
+                expression = pattern[3:] if pattern.startswith("re:") else fnmatch.translate(pattern[5:] if pattern.startswith("glob:") else pattern)
+                patterns.append(f"(?P<{group}>{expression})")
+                self.pattern_folders[group] = folder
+        self.pattern = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+        self.max_parts = max((suffix.count(".") + 1 for suffix in self.suffixes), default=1) #compound suffix has more parts
+        self.folders = tuple(categories) + (("Unknown",) if "Unknown" not in categories else ())
+
+    def classify(self, name):
+        """Method takes a file name as an argument
+        Returns designated folder ("Unknown" if no rule matches) and matched suffix (None if extension is the part after last dot)
+        Patterns are checked first, then the longest matching suffix"""
+        if self.pattern is not None:
+            match = self.pattern.match(name)
+            if match is not None:
+                return self.pattern_folders[match.lastgroup], None
+        lower = name.lower()
+        position = len(lower)
+        found = ("Unknown", None)
+        for _ in range(self.max_parts): #at most as many lookups as parts of the longest suffix
+            position = lower.rfind(".", 0, position)
+            if position <= 0: #no more dots, or name of a hidden file
+                break
+            folder = self.suffixes.get(lower[position + 1:])
+            if folder is not None:
+                found = (folder, name[position + 1:])
+        return found
+
+    def action(self, folder):
+        """Method takes designated folder as an argument and returns action of its files"""
+        return self.actions.get(folder, "unknown" if folder == "Unknown" else "known")
+
+    def is_known(self, name):
+        """Method takes a file name as an argument and returns True if any rule matches it"""
+        return self.classify(name)[0] != "Unknown"
+
+    def folder_of_extension(self, extension):
+        """Method takes extension (e.g. detected by content) as an argument and returns its designated folder"""
+        return self.suffixes.get(extension.lower(), "Unknown")
+
+def rule_values(folder, rule, key):
+    """Function takes designated folder, its rule and a key (extensions, suffixes or patterns) as arguments
+    Returns list of values of the key, raises ValueError if they are not a list of strings (e.g. extensions = "heic")"""
+    values = rule.get(key, ())
+    if not isinstance(values, (list, tuple)) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"{key} of {folder} needs to be a list of strings")
+    return list(values)
+
+def load_rules(path, defaults=None):
+    """Function takes path to rules file (TOML or JSON) and built-in categories as arguments
+    File has a table of categories, every category lists extensions, suffixes, patterns and optional action:
+        [categories.Images]
+        extensions = ["heic", "webp"]
+    Categories are added to built-in ones unless file sets inherit = false
+    Returns compiled Rules"""
+    mtime = os.stat(path).st_mtime_ns
+    if os.path.splitext(path)[1].lower() == ".toml":
+        import tomllib
+        with open(path, "rb") as rules_file:
+            config = tomllib.load(rules_file)
+    else:
+        with open(path, encoding="utf-8") as rules_file:
+            config = json.load(rules_file)
+    if not isinstance(config, dict) or not isinstance(config.get("categories", {}), dict):
+        raise ValueError("rules file needs to be a table with a table of categories")
+    categories = {}
+    if config.get("inherit", True) and defaults is not None:
+        categories = {folder: {key: list(values) if isinstance(values, (list, tuple)) else values for key, values in rule.items()} for folder, rule in defaults.categories.items()}
+    for folder, rule in config.get("categories", {}).items():
+        if not isinstance(rule, dict):
+            raise ValueError(f"category {folder} needs to be a table")
+        category = categories.setdefault(folder, {})
+        for key in ("extensions", "suffixes", "patterns"):
+            category[key] = list(category.get(key, ())) + rule_values(folder, rule, key)
+        if "action" in rule:
+            category["action"] = rule["action"]
+    return Rules(categories, defaults.actions if defaults is not None else None, path, mtime)
+
+def reload_rules(rules, defaults=None):
+    """Function takes Rules and built-in rules as arguments
+    Returns rules loaded again if their file changed since they were loaded, otherwise the same rules"""
+    if rules.path is None or os.stat(rules.path).st_mtime_ns == rules.mtime:
+        return rules
+    return load_rules(rules.path, defaults)
@@ -0,0 +1,130 @@
+import os
+import sys
+import struct
+import _socket #plain socket module imports far more than the client needs
+SOCKET_ENVIRONMENT = "CLEAN_FOLDER_SOCKET" #path of unix socket of resident server, client uses it when set
+PRELOADED_MODULES = ("clean_folder.clean", "clean_folder.report", "clean_folder.archives", "clean_folder.journal", "clean_folder.index", "clean_folder.dedup", "clean_folder.rules", "concurrent.futures.thread", "concurrent.futures.process", "shutil", "tarfile", "zipfile", "gzip", "csv", "sqlite3", "hashlib")
+LENGTH = struct.Struct(">I") #length of request sent before it
+STANDARD_STREAMS = 3 #stdin, stdout and stderr of the client are passed to the server
+
+def serve(socket_path):
+    """Function takes path to unix socket as an argument
+    Runs resident server: all modules are imported once, then every request of a client is run by main() in a forked process,
+    which writes straight to stdin, stdout and stderr passed by the client and sends back exit code
+    Runs until interrupted"""
+    import stat
+    import signal
+    import socket
+    import importlib
+    if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        raise OSError("server mode needs fork and unix sockets")
+    for name in PRELOADED_MODULES: #forked runs start with everything already loaded
+        importlib.import_module(name)
+    if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode): #left by server that was killed
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN) #finished runs are reaped by the system
+    signal.signal(signal.SIGTERM, signal.default_int_handler) #kill stops the server like Ctrl+C, removing the socket
+    print(f"Serving on {socket_path}, set {SOCKET_ENVIRONMENT}={socket_path} to use it, press Ctrl+C to stop")
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                handle_request(server, connection)
+    except KeyboardInterrupt:
+        print("Server stopped")
+    finally:
+        server.close()
+        os.remove(socket_path)
+    return
+
+def handle_request(server, connection):
+    """Function reads one request (working folder, arguments and standard streams of a client) and runs it in a forked process"""
+    import socket
+    message, fds, _, _ = socket.recv_fds(connection, 64 * 1024, STANDARD_STREAMS)
+    try:
+        while len(message) < LENGTH.size or len(message) < LENGTH.size + LENGTH.unpack_from(message)[0]:
+            chunk = connection.recv(64 * 1024)
+            if not chunk: #client went away before sending whole request
+                return
+            message += chunk
+        if len(fds) != STANDARD_STREAMS:
+            return
+        cwd, *arguments = [os.fsdecode(part) for part in message[LENGTH.size:].split(b"\0")]
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            server.close()
+            code = run_forked(cwd, arguments, fds)
+            try:
+                connection.sendall(LENGTH.pack(code))
+            except OSError: #client was stopped
+                pass
+            os._exit(code)
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return
+
+def run_forked(cwd, arguments, fds):
+    """Function runs main() in a forked server process as if it was started by the client
+    Returns exit code"""
+    import signal
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL) #process pools of the run wait for their processes
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    from clean_folder.clean import main
+    code = 1
+    try:
+        os.chdir(cwd)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        code = main(arguments)
+    except SystemExit as error: #wrong options exit at once
+        if isinstance(error.code, str):
+            print(error.code, file=sys.stderr)
+        code = error.code if isinstance(error.code, int) else int(error.code is not None)
+    except BaseException: #error is shown to the client like in a normal run
+        import traceback
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return code or 0
+
+def run_client(socket_path, arguments):
+    """Function takes path to unix socket of the server and command line arguments as arguments
+    Sends working folder, arguments and standard streams to the server and waits until the run is finished
+    Returns exit code of the run, None if no server is listening"""
+    client = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        try:
+            client.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError): #server is not running
+            return None
+        payload = b"\0".join(os.fsencode(part) for part in [os.getcwd()] + arguments)
+        fds = struct.pack(f"{STANDARD_STREAMS}i", *range(STANDARD_STREAMS))
+        client.sendmsg([LENGTH.pack(len(payload)) + payload], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, fds)])
+        reply = b""
+        while len(reply) < LENGTH.size:
+            chunk = client.recv(LENGTH.size - len(reply))
+            if not chunk: #forked run died without sending exit code
+                return 1
+            reply += chunk
+        return LENGTH.unpack(reply)[0]
+    finally:
+        client.close()
+
+def client_main():
+    """Console entry point, runs cleaning on resident server if CLEAN_FOLDER_SOCKET is set and server is listening
+    Otherwise cleaning runs in this process"""
+    socket_path = os.environ.get(SOCKET_ENVIRONMENT)
+    code = None
+    if socket_path and "--serve" not in sys.argv:
+        code = run_client(socket_path, sys.argv[1:])
+    if code is None:
+        from clean_folder.clean import main
+        code = main(sys.argv[1:])
+    sys.exit(code)
@@ -0,0 +1,62 @@
+import os
+import re
+READ_SIZE = 4096 #at most this many bytes are read from the beginning of a file
+MAGIC_SIGNATURES = ( #(offset, signature, extension), checked in order
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"%PDF-", "pdf"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),
+    (0, b"\x1a\x45\xdf\xa3", "mkv"),
+    (0, b"ID3", "mp3"),
+    (0, b"\xff\xfb", "mp3"),
+    (0, b"\xff\xf3", "mp3"),
+    (0, b"\xff\xf2", "mp3"),
+    (0, b"OggS", "ogg"),
+    (0, b"#!AMR", "amr"),
+    (0, b"\x1f\x8b", "gz"),
+    (257, b"ustar", "tar"),
+)
+RIFF_TYPES = {b"AVI ": "avi", b"WAVE": "wav"}
+OFFICE_FOLDERS = ((b"word/", "docx"), (b"xl/", "xlsx"), (b"ppt/", "pptx")) #first members of office documents
+FTYP_BRANDS = { #major brand of ISO media files (mp4, mov, heic, avif, m4a) which all start with "ftyp" box
+    b"isom": "mp4", b"iso2": "mp4", b"iso4": "mp4", b"iso5": "mp4", b"iso6": "mp4", b"mp41": "mp4", b"mp42": "mp4",
+    b"avc1": "mp4", b"dash": "mp4", b"M4V ": "mp4", b"qt  ": "mov",
+    b"heic": "heic", b"heix": "heic", b"hevc": "heic", b"hevx": "heic", b"mif1": "heic", b"msf1": "heic",
+    b"avif": "avif", b"avis": "avif",
+    b"M4A ": "m4a", b"M4B ": "m4a",
+}
+SVG_START = re.compile(rb"(?:\xef\xbb\xbf)?\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*(?:<!DOCTYPE svg[^>]*>\s*)?<svg[\s>]", re.DOTALL) #svg element after optional BOM, XML prolog, comments and doctype
+
+def sniff_file_type(path, read_size=READ_SIZE):
+    """Function takes a file path and number of bytes to read as arguments
+    Reads beginning of a file with a single pread and matches it against known signatures
+    Returns extension of detected type or None if type wasnt recognized"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        head = os.pread(fd, read_size, 0)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return match_signature(head)
+
+def match_signature(head):
+    """Function takes beginning of a file as an argument and returns extension of detected type or None"""
+    if head.startswith(b"RIFF") and head[8:12] in RIFF_TYPES:
+        return RIFF_TYPES[head[8:12]]
+    if head.startswith(b"PK\x03\x04"): #zip archive, office documents are zip archives too
+        for folder, extension in OFFICE_FOLDERS:
+            if folder in head:
+                return extension
+        return "zip"
+    if head.startswith(b"ftyp", 4): #unknown brands are not guessed
+        return FTYP_BRANDS.get(head[8:12])
+    for offset, signature, extension in MAGIC_SIGNATURES:
+        if head.startswith(signature, offset):
+            return extension
+    if SVG_START.match(head):
+        return "svg"
+    return None
@@ -0,0 +1,195 @@
+import os
+import errno
+import threading
+COPY_CHUNK = 8 * 1024 * 1024 #bytes copied by one copy_file_range/sendfile call
+FSYNC_BATCH_FILES = 64 #copied files are synced and their sources removed in batches
+FSYNC_BATCH_BYTES = 256 * 1024 * 1024
+
+class MoveSkipped(Exception):
+    """Raised when a move cant be done safely, the move is skipped and its files are left untouched"""
+
+class MoveEngine:
+    """Moves files with a rename that never replaces a file (link and unlink) when source and destination are on the same device
+    and with zero-copy copy_file_range/sendfile followed by removing the source otherwise
+    Copied files are fsynced in batches, sources are removed only after their copies were synced
+    Counts files and bytes moved with every strategy, also in Metrics if given"""
+
+    def __init__(self, metrics=None):
+        self.devices = {} #folder: st_dev, every folder is stated once
+        self.stats = {"rename": {"files": 0, "bytes": 0}, "copy": {"files": 0, "bytes": 0}}
+        self.unsynced = [] #(source, destination) copied but not synced yet
+        self.unsynced_bytes = 0
+        self.lock = threading.Lock()
+        self.metrics = metrics
+
+    def device(self, folder):
+        """Returns st_dev of a folder, stating it only the first time"""
+        folder = os.path.abspath(folder)
+        if folder not in self.devices:
+            self.devices[folder] = os.stat(folder).st_dev
+        return self.devices[folder]
+
+    def forget_devices(self):
+        """Forgets stated folders, so they are stated again, e.g. when they could be removed since"""
+        with self.lock:
+            self.devices.clear()
+
+    def move(self, source, destination):
+        """Takes source and destination paths as arguments, moves the file and returns its size
+        Existing file is never replaced (e.g. it appeared after a plan was saved), MoveSkipped is raised instead"""
+        size = os.lstat(source).st_size
+        if os.path.lexists(destination):
+            raise MoveSkipped("destination exists")
+        if os.path.islink(source): #links are moved the usual way
+            import shutil
+            shutil.move(source, destination)
+            self.count("rename", size)
+            return size
+        if self.device(os.path.dirname(os.path.abspath(source))) == self.device(os.path.dirname(os.path.abspath(destination))):
+            try:
+                rename_no_replace(source, destination)
+                self.count("rename", size)
+                return size
+            except OSError as error:
+                if error.errno != errno.EXDEV: #same st_dev, but rename still crosses a mount (e.g. bind mount)
+                    raise
+        try:
+            copy_file(source, destination)
+        except FileExistsError: #destination appeared meanwhile
+            raise MoveSkipped("destination exists") from None
+        self.count("copy", size)
+        with self.lock:
+            self.unsynced.append((source, destination))
+            self.unsynced_bytes += size
+            if len(self.unsynced) >= FSYNC_BATCH_FILES or self.unsynced_bytes >= FSYNC_BATCH_BYTES:
+                self.sync_batch()
+        return size
+
+    def remove_later(self, source):
+        """Takes path of a file which content was saved elsewhere (e.g. unpacked archive) as an argument
+        Source is removed with the next batch, after everything written so far was synced"""
+        with self.lock:
+            self.unsynced.append((source, None))
+            if len(self.unsynced) >= FSYNC_BATCH_FILES:
+                self.sync_batch()
+
+    def count(self, strategy, size):
+        with self.lock:
+            self.stats[strategy]["files"] += 1
+            self.stats[strategy]["bytes"] += size
+        if self.metrics is not None:
+            self.metrics.count(strategy)
+
+    def flush(self):
+        """Syncs all copied files and removes their sources, called at the end of a run"""
+        with self.lock:
+            self.sync_batch()
+
+    def sync_batch(self):
+        """Fsyncs copied files and their folders, then removes sources, lock has to be held
+        Sources without destination (unpacked archives) need whole filesystem synced"""
+        folders = set()
+        for source, destination in self.unsynced:
+            if destination is None:
+                continue
+            fsync_path(destination)
+            folders.add(os.path.dirname(os.path.abspath(destination)))
+        for folder in folders:
+            fsync_path(folder)
+        if any(destination is None for source, destination in self.unsynced):
+            os.sync()
+        for source, destination in self.unsynced:
+            os.remove(source)
+        self.unsynced = []
+        self.unsynced_bytes = 0
+
+def rename_no_replace(source, destination):
+    """Renames a file without replacing existing destination: hard link to destination, then source is removed
+    Filesystems without hard links get plain rename after checking destination
+    Raises MoveSkipped if destination exists"""
+    try:
+        os.link(source, destination, follow_symlinks=False)
+    except FileExistsError:
+        raise MoveSkipped("destination exists") from None
+    except OSError as error:
+        if error.errno not in (errno.EPERM, errno.EOPNOTSUPP, errno.EMLINK, errno.ENOSYS): #e.g. EXDEV is handled by caller
+            raise
+        if os.path.lexists(destination):
+            raise MoveSkipped("destination exists") from None
+        os.rename(source, destination)
+        return
+    os.unlink(source)
+    return
+
+def fsync_path(path):
+    """Fsyncs a file or a folder given by path"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError: #some systems cant sync folders
+        pass
+    finally:
+        os.close(fd)
+
+def copy_range(source_fd, destination_fd, offset, count):
+    """Copies part of a file inside the kernel with copy_file_range"""
+    return os.copy_file_range(source_fd, destination_fd, count, offset, offset)
+
+def send_file(source_fd, destination_fd, offset, count):
+    """Copies part of a file inside the kernel with sendfile"""
+    return os.sendfile(destination_fd, source_fd, offset, count)
+
+ZERO_COPY_METHODS = tuple(method for method, name in ((copy_range, "copy_file_range"), (send_file, "sendfile")) if hasattr(os, name))
+NOT_SUPPORTED = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF) #errors after which next copy method is tried
+
+def copy_file(source, destination):
+    """Copies a file using copy_file_range, sendfile or plain reads, whichever works first
+    File times and permissions are copied too"""
+    import shutil #only copies across devices need it
+    with open(source, "rb") as source_file, open(destination, "xb") as destination_file:
+        source_fd, destination_fd = source_file.fileno(), destination_file.fileno()
+        size = os.fstat(source_fd).st_size
+        for method in ZERO_COPY_METHODS:
+            try:
+                copied = 0
+                while copied < size:
+                    sent = method(source_fd, destination_fd, copied, min(COPY_CHUNK, size - copied))
+                    if sent == 0:
+                        break
+                    copied += sent
+                if copied >= size:
+                    break
+            except OSError as error:
+                if error.errno not in NOT_SUPPORTED:
+                    raise
+            os.ftruncate(destination_fd, 0) #next method starts from the beginning
+            os.lseek(destination_fd, 0, os.SEEK_SET)
+        else: #no zero-copy method worked
+            source_file.seek(0)
+            shutil.copyfileobj(source_file, destination_file, COPY_CHUNK)
+    shutil.copystat(source, destination)
+    return destination
+
+def same_content(first, second):
+    """Returns True if two files have the same size and bytes"""
+    import filecmp
+    return filecmp.cmp(first, second, shallow=False)
+
+def replace_with_link(duplicate, target):
+    """Takes path of a duplicate and path of the file it duplicates as arguments
+    Replaces the duplicate with hard link to target, only if both files still have the same content
+    Link is made under a temporary name and renamed over the duplicate, so the duplicate is never removed without its link in place
+    Raises MoveSkipped if files differ or link cant be made, FileNotFoundError if one of them is gone before they are compared"""
+    if os.path.samefile(duplicate, target): #already linked
+        return
+    if not same_content(duplicate, target): #one of the files changed after duplicates were found
+        raise MoveSkipped(f"content differs from {target}, not linked")
+    temporary = os.path.join(os.path.dirname(duplicate), f".{os.path.basename(duplicate)}.link")
+    if os.path.lexists(temporary): #left by a run that was stopped
+        os.remove(temporary)
+    try:
+        os.link(target, temporary)
+    except OSError as error: #e.g. other device or no hard links on the filesystem
+        raise MoveSkipped(f"link to {target} not made: {error.strerror}") from error
+    os.replace(temporary, duplicate)
+    return
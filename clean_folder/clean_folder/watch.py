@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import ctypes
+import select
+import struct
+from pathlib import Path
+from clean_folder import clean
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII") #wd, mask, cookie, length of name
+READ_SIZE = 64 * 1024
+
+class Inotify:
+    """Thin ctypes binding to Linux inotify
+    Keeps track of watched folders by watch descriptor"""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("watch mode needs Linux inotify")
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {} #watch descriptor: folder path
+
+    def add_watch(self, folder):
+        """Starts watching a folder, returns False if folder is already gone"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.folders[wd] = folder
+        return True
+
+    def read_events(self):
+        """Generator yields (folder, name, mask) of every event waiting in inotify queue"""
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        position = 0
+        while position < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, position)
+            name = data[position + EVENT_HEADER.size:position + EVENT_HEADER.size + length].rstrip(b"\0")
+            position += EVENT_HEADER.size + length
+            if mask & IN_IGNORED:
+                self.folders.pop(wd, None)
+                continue
+            yield self.folders.get(wd), os.fsdecode(name), mask
+
+    def close(self):
+        os.close(self.fd)
+
+def watch_folder(session, settle=2, quiet=False):
+    """Function takes CleanSession, settle time and quiet flag (only errors and skipped files are printed) as arguments
+    Watches the folder with inotify and cleans files as they appear, until interrupted
+    File is processed when it had no events for settle seconds, so partially written files are not moved
+    Files settled at the same time are planned and moved as one batch"""
+    inotify = Inotify()
+    pending = {} #file path: time of last event
+    main_path_to_clean = session.folder_to_clean
+    try:
+        watch_tree(inotify, main_path_to_clean, pending, session.designated_folders())
+        session.names.checkpoint() #moves of the first run dont make destination folders listed again
+        if not quiet:
+            print(f"Watching folder {main_path_to_clean}, press Ctrl+C to stop")
+        while True:
+            timeout = settle if not pending else max(0, min(pending.values()) + settle - time.monotonic())
+            ready, _, _ = select.select([inotify.fd], [], [], timeout)
+            if ready:
+                for folder, name, mask in inotify.read_events():
+                    handle_event(inotify, session, pending, folder, name, mask)
+            settled = [path for path, last_event in pending.items() if time.monotonic() - last_event >= settle]
+            if settled:
+                for path in settled:
+                    del pending[path]
+                clean_batch(session, settled, quiet)
+    except KeyboardInterrupt:
+        if not quiet:
+            print("Watching stopped")
+    finally:
+        inotify.close()
+    return
+
+def watch_tree(inotify, folder, pending, ignored=clean.DESIGNATED_FOLDERS):
+    """Function starts watching a folder and all its subfolders (designated folders, given by ignored names, are ignored)
+    Files already inside are added to pending files, as they could be created before watch was added"""
+    inotify.add_watch(str(folder))
+    for entry in clean.scan_folder(folder, ignored=ignored):
+        if entry.is_dir(follow_symlinks=False):
+            inotify.add_watch(entry.path)
+        else:
+            pending[entry.path] = time.monotonic()
+    return
+
+def handle_event(inotify, session, pending, folder, name, mask):
+    """Function takes one inotify event and updates watched folders and pending files"""
+    if mask & IN_Q_OVERFLOW: #events were lost, whole folder is checked again
+        watch_tree(inotify, session.folder_to_clean, pending, session.designated_folders())
+        return
+    if folder is None or mask & IN_DELETE_SELF:
+        return
+    path = os.path.join(folder, name)
+    if mask & IN_ISDIR:
+        if mask & (IN_CREATE | IN_MOVED_TO) and name not in session.designated_folders(): #new subfolder
+            watch_tree(inotify, path, pending, session.designated_folders())
+        return
+    pending[path] = time.monotonic() #every event on a file restarts its settle time
+    return
+
+def clean_batch(session, paths, quiet=False):
+    """Function takes CleanSession, paths of settled files and quiet flag as arguments
+    Sends the files through the usual plan and move pipeline of the session
+    Rules file is loaded again before the batch if it was changed, destination folders are checked again
+    and listed again only if they changed
+    Folders emptied by the batch are removed, files which were not moved are reported with the reason"""
+    files = [Path(path) for path in paths if os.path.isfile(path) and not session.is_own_file(path)] #journal gets events too
+    if not files:
+        return
+    if session.reload_rules() and not quiet:
+        print(f"Rules loaded again from {session.rules.path}")
+    session.names.refresh() #destination folders changed since last batch are listed again
+    session.forget_cached_folders() #and could be removed, so they are created again
+    session.reset_results() #results of a batch are reported and forgotten, so watching long doesnt use more and more memory
+    session.run_moves(session.plan_moves(files))
+    session.names.checkpoint() #own moves dont make destination folders listed again
+    for folder in {file.parent for file in files}:
+        remove_empty_parents(folder, session.folder_to_clean)
+    clean.skipped_files_report(session.result()) #printed also when quiet
+    skipped = len(session.skipped_files)
+    if not quiet:
+        print(f"Cleaned {len(files) - skipped} files" + (f", {skipped} skipped" if skipped else ""))
+    return
+
+def remove_empty_parents(folder, main_path_to_clean):
+    """Function removes a folder and its parents up to folder to clean, stopping at first folder that is not empty"""
+    root = os.path.abspath(main_path_to_clean)
+    folder = os.path.abspath(folder)
+    while folder != root and folder.startswith(root + os.sep):
+        try:
+            os.rmdir(folder)
+        except OSError: #folder is not empty
+            return
+        folder = os.path.dirname(folder)
+    return
@@ -7,5 +7,5 @@ setup(name = 'clean_folder',
       author='MrGegi',
       author_email='randomemail@something.com',
       licence='None',
-      packages=find_namespace_packages(),
-      entry_points={'console_scripts': ['clean_folder = clean_folder.clean:main']})
\ No newline at end of file
+      packages=find_namespace_packages(include=['clean_folder', 'clean_folder.*']),
+      entry_points={'console_scripts': ['clean_folder = clean_folder.server:client_main']})
\ No newline at end of file
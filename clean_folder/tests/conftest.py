@@ -0,0 +1,52 @@
+import os
+import pytest
+from clean_folder import clean
+from clean_folder.benchmark import generate_tree
+
+@pytest.fixture
+def tree(tmp_path):
+    """Synthetic folder to clean with nested subfolders, polish names, unknown files and archives"""
+    return generate_tree(tmp_path / "root", files=300, depth=2, fanout=3, seed=1, archives=5, unknown=10, file_size=64)
+
+def walked_files(root):
+    """Returns names of all files inside a folder, subfolders included"""
+    return [entry.name for entry in clean.scan_folder(root) if not entry.is_dir(follow_symlinks=False)]
+
+def contents(root):
+    """Returns sorted list of bytes of every file inside a folder, so files can be compared before and after cleaning"""
+    found = []
+    for folder, subfolders, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(folder, name), "rb") as file:
+                found.append(file.read())
+    return sorted(found)
+
+def layout_problems(root, result, generated):
+    """Returns list of problems of layout on disk after cleaning: entries next to the folder or left in it,
+    files in a wrong designated folder, archives not unpacked into folders and lost files"""
+    problems = []
+    siblings = sorted(set(os.listdir(root.parent)) - {root.name})
+    if siblings:
+        problems.append(f"entries next to folder to clean: {siblings[:5]}")
+    archive_count = sum(1 for name in generated if clean.classify(name)[0] == "Archives")
+    moved, unpacked = 0, 0
+    for folder in os.scandir(root):
+        if not folder.is_dir(follow_symlinks=False) or folder.name not in clean.DESIGNATED_FOLDERS:
+            problems.append(f"entry left in folder to clean: {folder.name}")
+            continue
+        for entry in os.scandir(folder.path):
+            if "\\" in entry.name and os.sep != "\\":
+                problems.append(f"backslash in name: {entry.path}")
+            if folder.name == "Archives":
+                unpacked += 1
+                if not entry.is_dir(follow_symlinks=False):
+                    problems.append(f"archive was not unpacked into a folder: {entry.name}")
+                continue
+            moved += 1
+            if clean.classify(entry.name)[0] != folder.name:
+                problems.append(f"{entry.name} is in {folder.name}")
+    if moved != len(generated) - archive_count:
+        problems.append(f"{len(generated) - archive_count} files were generated, {moved} are in designated folders")
+    if unpacked != archive_count - len(result.skipped_files):
+        problems.append(f"{archive_count} archives were generated, {unpacked} were unpacked, {len(result.skipped_files)} skipped")
+    return problems
@@ -0,0 +1,70 @@
+import os
+from clean_folder import clean
+
+CONTENT, CHANGED = b"same content" * 100, b"changed content" * 100
+
+def make_duplicates(root):
+    """Creates folder to clean with two files of the same content and one other file"""
+    root.mkdir()
+    for name in ("one.txt", "two.txt"):
+        (root / name).write_bytes(CONTENT)
+    (root / "other.txt").write_bytes(b"other")
+    return root
+
+def documents(root):
+    return sorted((root / "Documents").iterdir())
+
+def test_hardlink(tmp_path):
+    """Duplicate is moved and replaced with hard link to the first file"""
+    root = make_duplicates(tmp_path / "root")
+    with clean.CleanSession(root, duplicates_action="hardlink") as session:
+        session.run()
+    linked = [path for path in documents(root) if path.name != "other.txt"]
+    assert len(linked) == 2 and os.path.samefile(*linked)
+
+def test_hardlink_keeps_duplicate_when_original_is_gone(tmp_path):
+    """Duplicate is kept and reported as skipped when the original was removed after planning"""
+    root = make_duplicates(tmp_path / "root")
+    with clean.CleanSession(root, duplicates_action="hardlink") as session:
+        moves = list(session.plan_folder())
+        original = next(move for move in moves if move[0] == "link")[2]
+        os.remove(next(move[1] for move in moves if move[2] == original))
+        result = session.apply_plan(moves)
+    assert [path.read_bytes() for path in documents(root) if path.name != "other.txt"] == [CONTENT]
+    assert result.skipped_files
+
+def test_hardlink_skips_changed_duplicate_of_saved_plan(tmp_path):
+    """Duplicate changed between dry run and applied plan is not linked and keeps its content"""
+    root = make_duplicates(tmp_path / "root")
+    plan_path = tmp_path / "plan.jsonl"
+    with clean.CleanSession(root, duplicates_action="hardlink") as session:
+        clean.write_plan(session.plan_folder(), plan_path, root)
+    _, moves = clean.read_plan(plan_path)
+    moves = list(moves)
+    duplicate = next(move for move in moves if move[0] == "link")[1]
+    (next(move[1] for move in moves if move[2] == duplicate)).write_bytes(CHANGED)
+    with clean.CleanSession(root) as session:
+        session.apply_plan(moves)
+    kept = [path for path in documents(root) if path.name != "other.txt"]
+    assert sorted(path.read_bytes() for path in kept) == sorted([CONTENT, CHANGED])
+    assert not os.path.samefile(*kept)
+
+def test_skip_and_move(tmp_path):
+    """Skipped duplicate stays in the folder, moved duplicate goes to Duplicates folder"""
+    root = make_duplicates(tmp_path / "skip")
+    with clean.CleanSession(root, duplicates_action="skip") as session:
+        result = session.run()
+    assert len(result.skipped_files) == 1 and len(documents(root)) == 2
+    root = make_duplicates(tmp_path / "move")
+    with clean.CleanSession(root, duplicates_action="move") as session:
+        session.run()
+    assert len(documents(root)) == 2 and len(list((root / "Duplicates").iterdir())) == 1
+
+def test_duplicates_folder_is_cleaned_without_dedup(tmp_path):
+    """User's folder named Duplicates is cleaned as any other folder when duplicates are not moved there"""
+    root = tmp_path / "root"
+    (root / "Duplicates").mkdir(parents=True)
+    (root / "Duplicates" / "a.txt").write_bytes(b"a")
+    with clean.CleanSession(root) as session:
+        session.run()
+    assert (root / "Documents" / "a.txt").exists() and not (root / "Duplicates").exists()
@@ -0,0 +1,76 @@
+import pytest
+from clean_folder import clean
+from clean_folder.journal import Journal, read_journal
+from conftest import contents, layout_problems, walked_files
+
+def stop_run(root, journal_path, finished):
+    """Starts a journaled run and stops it like a crash: all moves are journaled, only first finished moves are executed
+    and next file is left half copied"""
+    session = clean.CleanSession(root, journal_path=journal_path)
+    session.open_journal()
+    moves = list(session.plan_folder())
+    files = [move for move in moves if move[0] in ("known", "unknown")]
+    for move in moves:
+        session.journal_move(move)
+        if move[0] == "folder":
+            session.record_move(session.apply_move(move))
+    for move in files[:finished]:
+        session.record_move(session.apply_move(move))
+    action, item, destination, file_extension = files[finished]
+    destination.write_bytes(item.read_bytes()[:10]) #half copied file
+    session.journal.flush()
+    session.journal.file.close()
+
+def test_resume_finishes_stopped_run(tree, tmp_path_factory):
+    """Resumed run removes half copied file and finishes every move, no file is lost or left twice"""
+    archives = [path for path in tree.rglob("*") if path.is_file() and clean.classify(path.name)[0] == "Archives"]
+    before = contents(tree)
+    archive_contents = sorted(path.read_bytes() for path in archives)
+    generated = walked_files(tree)
+    journal_path = tmp_path_factory.mktemp("journal") / "run.journal"
+    stop_run(tree, journal_path, 20)
+    with clean.CleanSession(tree, journal_path=journal_path) as session:
+        result = session.resume()
+    assert layout_problems(tree, result, generated) == []
+    moved = contents(tree) #unpacked files are compared with archives below
+    unpacked = contents(tree / "Archives") if (tree / "Archives").exists() else []
+    assert sorted(moved + archive_contents) == sorted(before + unpacked)
+    records, next_id = read_journal(journal_path)
+    assert all(finished for move_id, move, finished, skipped_reason in records)
+
+def test_resume_doesnt_retry_skipped_files(tmp_path):
+    """File skipped by the stopped run stays skipped and is not journaled again"""
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "bad.zip").write_bytes(b"x")
+    (root / "a.txt").write_bytes(b"a")
+    journal_path = tmp_path / "run.journal"
+    with clean.CleanSession(root, journal_path=journal_path) as session:
+        session.run()
+    with clean.CleanSession(root, journal_path=journal_path) as session:
+        result = session.resume()
+    assert "bad.zip" in next(iter(result.skipped_files))
+    assert journal_path.read_text(encoding="utf-8").count("bad.zip") == 1
+
+def test_journal_of_other_folder_or_unfinished_run_is_refused(tmp_path):
+    """Journal is used again only by a finished run of the same folder, ids continue"""
+    first, second = tmp_path / "first", tmp_path / "second"
+    for root in (first, second):
+        root.mkdir()
+        (root / "a.txt").write_bytes(b"a")
+    journal_path = tmp_path / "run.journal"
+    with clean.CleanSession(first, journal_path=journal_path) as session:
+        session.run()
+    with pytest.raises(ValueError):
+        Journal(journal_path, second)
+    (first / "b.txt").write_bytes(b"b")
+    with clean.CleanSession(first, journal_path=journal_path) as session:
+        session.run()
+    records, next_id = read_journal(journal_path)
+    assert len({move_id for move_id, move, finished, skipped_reason in records}) == len(records)
+    journal = Journal(journal_path, first)
+    journal.started(("known", first / "c.txt", first / "Documents" / "c.txt", "txt"))
+    journal.close()
+    with pytest.raises(ValueError):
+        Journal(journal_path, first)
+    assert clean.main([str(first), "--journal", str(journal_path), "-q"]) == clean.EXIT_FAILURE
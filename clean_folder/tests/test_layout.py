@@ -0,0 +1,39 @@
+import os
+import asyncio
+import pytest
+from clean_folder import clean
+from clean_folder.aio import clean_async
+from clean_folder.batch import clean_roots
+from conftest import walked_files, layout_problems
+
+@pytest.mark.parametrize("workers, extract_workers", [(1, 0), (4, 0), (4, 2)])
+def test_session_layout(tree, workers, extract_workers):
+    """Every file ends up in designated folder of its extension, archives are unpacked and nothing is created next to the folder"""
+    generated = walked_files(tree)
+    with clean.CleanSession(tree, workers, extract_workers) as session:
+        result = session.run()
+    assert layout_problems(tree, result, generated) == []
+
+def test_async_layout(tree):
+    """Streaming pipeline leaves the same layout as a session run"""
+    generated = walked_files(tree)
+    result = asyncio.run(clean_async(tree, workers=3, extract_workers=1))
+    assert layout_problems(tree, result, generated) == []
+
+def test_batch_layout(tmp_path):
+    """Every root of a batch is cleaned on its own"""
+    from clean_folder.benchmark import generate_tree
+    roots = [generate_tree(tmp_path / name / "root", files=100, depth=1, seed=index) for index, name in enumerate(("one", "two"))]
+    generated = [walked_files(root) for root in roots]
+    results = clean_roots(roots, workers=3, extract_workers=1)
+    for root, result, names in zip(roots, results, generated):
+        assert layout_problems(root, result, names) == []
+
+def test_report_lists_unpacked_files(tree):
+    """File list of a run holds every moved and unpacked file with its size"""
+    with clean.CleanSession(tree) as session:
+        result = session.run()
+    rows = list(clean.moved_rows(result.files))
+    on_disk = sorted(name for folder, subfolders, names in os.walk(tree) for name in names)
+    assert sorted(name for folder, name, size in rows) == on_disk
+    assert all(size is not None for folder, name, size in rows)
@@ -0,0 +1,32 @@
+from clean_folder import clean
+
+def make_folder(root):
+    root.mkdir()
+    (root / "a.jpg").write_bytes(b"new")
+    (root / "b.txt").write_bytes(b"b")
+    return root
+
+def test_plan_inside_folder_is_not_planned(tmp_path):
+    """Plan saved inside folder to clean doesnt plan itself and is left where it is by the applied plan"""
+    root = make_folder(tmp_path / "root")
+    plan_path = root / "plan.jsonl"
+    assert clean.main([str(root), "--dry-run", str(plan_path), "-q"]) == clean.EXIT_OK
+    assert "plan.jsonl" not in plan_path.read_text(encoding="utf-8").split("\n", 1)[1]
+    assert clean.main(["--apply-plan", str(plan_path), "-q"]) == clean.EXIT_OK
+    assert plan_path.exists()
+    assert (root / "Images" / "a.jpg").read_bytes() == b"new" and (root / "Documents" / "b.txt").exists()
+
+def test_applied_plan_never_replaces_files(tmp_path):
+    """File which appeared at planned destination after dry run is kept, planned file is skipped"""
+    root = make_folder(tmp_path / "root")
+    plan_path = tmp_path / "plan.jsonl"
+    with clean.CleanSession(root) as session:
+        clean.write_plan(session.plan_folder(), plan_path, root)
+    (root / "Images").mkdir()
+    (root / "Images" / "a.jpg").write_bytes(b"precious")
+    folder_to_clean, moves = clean.read_plan(plan_path)
+    with clean.CleanSession(folder_to_clean) as session:
+        result = session.apply_plan(moves)
+    assert (root / "Images" / "a.jpg").read_bytes() == b"precious"
+    assert (root / "a.jpg").read_bytes() == b"new"
+    assert result.skipped_files == {str(root / "a.jpg"): "destination exists"}